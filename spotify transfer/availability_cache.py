@@ -0,0 +1,62 @@
+import os
+import sqlite3
+import threading
+import time
+
+AVAILABILITY_CACHE_FILE = os.getenv("SPOTIFY_AVAILABILITY_CACHE_FILE", "availability_cache.db")
+DEFAULT_TTL = int(os.getenv("SPOTIFY_AVAILABILITY_TTL", str(7 * 24 * 3600)))  # Seconds
+QUERY_CHUNK = 500  # IDs per SELECT, well under SQLite's bound-parameter limit
+
+
+class AvailabilityCache:
+    """On-disk record of whether track IDs can be saved in a market, and what they relink to.
+
+    Markets gain and lose tracks over time, so entries expire after ttl
+    seconds; expired rows are dropped when the cache is opened.
+    """
+
+    def __init__(self, path=AVAILABILITY_CACHE_FILE, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS availability (
+                market TEXT NOT NULL,
+                track_id TEXT NOT NULL,
+                playable INTEGER NOT NULL,
+                replacement TEXT,
+                checked_at REAL NOT NULL,
+                PRIMARY KEY (market, track_id)
+            );
+        """)
+        self.db.execute("DELETE FROM availability WHERE checked_at < ?", (time.time() - ttl,))
+        self.db.commit()
+
+    def get(self, market, track_ids):
+        """{track ID: (playable, replacement ID or None)} for the IDs checked within the TTL"""
+        found = {}
+        cutoff = time.time() - self.ttl
+        with self.lock:
+            for i in range(0, len(track_ids), QUERY_CHUNK):
+                chunk = track_ids[i:i + QUERY_CHUNK]
+                rows = self.db.execute(
+                    f"SELECT track_id, playable, replacement FROM availability "
+                    f"WHERE market = ? AND checked_at >= ? AND track_id IN ({','.join('?' * len(chunk))})",
+                    (market, cutoff, *chunk))
+                for track_id, playable, replacement in rows:
+                    found[track_id] = (bool(playable), replacement)
+        return found
+
+    def put(self, market, results):
+        """Store {track ID: (playable, replacement ID or None)} as checked now"""
+        now = time.time()
+        with self.lock:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO availability VALUES (?, ?, ?, ?, ?)",
+                [(market, track_id, int(playable), replacement, now)
+                 for track_id, (playable, replacement) in results.items()])
+            self.db.commit()
+
+    def close(self):
+        with self.lock:
+            self.db.close()
@@ -0,0 +1,61 @@
+"""Response size (uncompressed) and parse time for a playlist listing, full objects vs `fields`.
+
+Run from the project directory:
+    python benchmarks/bench_fields.py [tracks]
+"""
+import sys
+import time
+
+import common
+from mock_spotify import MockSpotify
+from rate_limiter import RateLimiter
+from spotify_client import SpotifyClient
+
+
+def list_playlist(transfer, client, playlist_id, total, fields=None):
+    """(bytes received, seconds decoding JSON, seconds packing) over every page"""
+    received = decoding = packing = 0.0
+    for offset in range(0, total, 100):
+        params = {"limit": 100, "offset": offset}
+        if fields:
+            params["fields"] = fields
+        res = client.get(f"/playlists/{playlist_id}/tracks", params=params)
+        res.raise_for_status()
+        received += len(res.content)
+
+        start = time.perf_counter()
+        items = res.json()["items"]
+        decoding += time.perf_counter() - start
+
+        start = time.perf_counter()
+        transfer.pack_track_items(items)
+        packing += time.perf_counter() - start
+    return received, decoding, packing
+
+
+def main():
+    total = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    transfer = common.load_transfer_module()
+
+    mock = MockSpotify()
+    account = mock.add_account("bench_user", playlists=[("Large", total)])
+    playlist_id = next(iter(account.playlists))
+    api_base, _ = mock.start()
+
+    try:
+        with SpotifyClient(mock.token_for("bench_user"), api_base=api_base,
+                           rate_limiter=RateLimiter(1000, max_rate=1000)) as client:
+            full = list_playlist(transfer, client, playlist_id, total)
+            trimmed = list_playlist(transfer, client, playlist_id, total, transfer.PLAYLIST_TRACK_FIELDS)
+    finally:
+        mock.shutdown()
+
+    print(f"Playlist of {total} tracks, {(total + 99) // 100} pages")
+    print(f"{'':<16}{'bytes':>14}{'json decode':>14}{'pack':>10}")
+    for label, (received, decoding, packing) in (("full objects", full), ("fields=", trimmed)):
+        print(f"{label:<16}{received:>14,.0f}{decoding * 1000:>12.1f}ms{packing * 1000:>8.1f}ms")
+    print(f"   {full[0] / trimmed[0]:.1f}x fewer bytes, {full[1] / trimmed[1]:.1f}x faster decoding")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Compare per-request latency of one-off requests vs the pooled SpotifyClient.
+
+Run from the project directory:
+    python benchmarks/bench_http_client.py [requests]
+"""
+import sys
+import time
+
+import requests
+
+import common  # noqa: F401  (puts the project directory on sys.path)
+from rate_limiter import RateLimiter
+from spotify_client import SpotifyClient
+from stub_server import start_stub_server
+
+UNLIMITED = 1e9  # Requests per second; high enough that the limiter never waits, so only pooling is measured
+
+
+def time_requests(fn, count):
+    start = time.perf_counter()
+    for _ in range(count):
+        fn().raise_for_status()
+    return (time.perf_counter() - start) / count
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    server, api_base = start_stub_server()
+    headers = {"Authorization": "Bearer stub"}
+
+    try:
+        unpooled = time_requests(lambda: requests.get(f"{api_base}/me", headers=headers), count)
+        rate_limiter = RateLimiter(UNLIMITED, max_rate=UNLIMITED)
+        with SpotifyClient("stub", api_base=api_base, rate_limiter=rate_limiter) as client:
+            pooled = time_requests(lambda: client.get("/me"), count)
+    finally:
+        server.shutdown()
+
+    print(f"Requests per run: {count}")
+    print(f"   requests.get (new connection): {unpooled * 1000:.3f} ms/request")
+    print(f"   SpotifyClient (pooled):        {pooled * 1000:.3f} ms/request")
+    print(f"   Speedup: {unpooled / pooled:.2f}x")
+    print("   (plain HTTP on localhost; TLS handshakes to api.spotify.com widen the gap)")
+
+
+if __name__ == "__main__":
+    main()
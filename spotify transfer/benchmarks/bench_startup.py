@@ -0,0 +1,98 @@
+"""Time from launching `spotify transfer.py` to its first transfer request, against the mock API.
+
+Run from the project directory:
+    python benchmarks/bench_startup.py [--latency 0.05] [--runs 5]
+
+Each run starts the tool as a fresh process, in batch mode and in the
+interactive mode (answering the prompts on stdin), and reads the mock's
+request log: the first request of any kind shows the import and setup
+cost, the first request that isn't a token refresh or /me shows when the
+transfer itself began. "cold" runs start from refresh tokens only;
+"warm" runs reuse the access tokens an earlier run saved, as cron jobs
+an hour apart would.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import common
+from mock_spotify import MockSpotify
+
+SCRIPT = os.path.join(common.PACKAGE_DIR, "spotify transfer.py")
+BOOTSTRAP_PATHS = ("/api/token", "/v1/me")
+
+
+def write_tokens(mock, mode):
+    if mode == "batch":
+        os.makedirs("tokens", exist_ok=True)
+        for user_id in ("source_user", "dest_user"):
+            with open(os.path.join("tokens", f"{user_id}.json"), "w") as f:
+                json.dump({"refresh_token": mock.refresh_token_for(user_id)}, f)
+        with open("jobs.json", "w") as f:
+            json.dump({"accounts": {user_id: {"client_id": "id", "client_secret": "secret"}
+                                    for user_id in ("source_user", "dest_user")},
+                       "jobs": [{"source": "source_user", "destination": "dest_user", "content": "liked"}]}, f)
+    else:
+        with open("spotify_tokens.json", "w") as f:
+            json.dump({"account1_refresh_token": mock.refresh_token_for("source_user"),
+                       "account2_refresh_token": mock.refresh_token_for("dest_user")}, f)
+
+
+def launch(mock, mode, env):
+    """(seconds to first request, seconds to first transfer request, bootstrap requests) for one run"""
+    command = [sys.executable, SCRIPT] + (["--batch", "jobs.json"] if mode == "batch" else [])
+    logged = len(mock.request_log)
+    start = time.time()
+    # The leading Enter answers the "switch accounts" prompt where one is shown; elsewhere it is re-asked
+    subprocess.run(command, input="\n1\n1\n", text=True, env=env, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    requests = mock.request_log[logged:]
+    first_transfer = next(i for i, (_, _, path) in enumerate(requests) if path not in BOOTSTRAP_PATHS)
+    return requests[0][0] - start, requests[first_transfer][0] - start, first_transfer
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds the mock adds to every response")
+    parser.add_argument("--runs", type=int, default=5, help="runs per case; medians are reported")
+    args = parser.parse_args()
+
+    mock = MockSpotify(args.latency)
+    mock.add_account("source_user", 100)
+    mock.add_account("dest_user")
+    api_base, accounts_base = mock.start()
+    env = dict(os.environ, SPOTIFY_API_BASE=api_base, SPOTIFY_ACCOUNTS_BASE=accounts_base,
+               SPOTIFY_ACCOUNT1_CLIENT_ID="id", SPOTIFY_ACCOUNT1_CLIENT_SECRET="secret",
+               SPOTIFY_ACCOUNT2_CLIENT_ID="id", SPOTIFY_ACCOUNT2_CLIENT_SECRET="secret")
+
+    print(f"Mock latency {args.latency * 1000:.0f}ms, median of {args.runs} runs")
+    print(f"{'case':<20}{'first request':>15}{'first transfer':>16}{'bootstrap reqs':>16}")
+    cwd = os.getcwd()
+    try:
+        for mode in ("batch", "interactive"):
+            for warm in (False, True):
+                runs = []
+                for _ in range(args.runs):
+                    with tempfile.TemporaryDirectory() as workdir:
+                        os.chdir(workdir)
+                        write_tokens(mock, mode)
+                        if warm:
+                            launch(mock, mode, env)  # Saves the access tokens the measured run reuses
+                        runs.append(launch(mock, mode, env))
+                        os.chdir(cwd)
+                first, transfer, bootstrap = (statistics.median(column) for column in zip(*runs))
+                label = f"{mode} ({'warm' if warm else 'cold'})"
+                print(f"{label:<20}{first * 1000:>13.0f}ms{transfer * 1000:>14.0f}ms{bootstrap:>16.0f}")
+    finally:
+        os.chdir(cwd)
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
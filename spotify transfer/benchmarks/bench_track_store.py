@@ -0,0 +1,71 @@
+"""Compare memory and diff time of list-of-dict track results vs TrackList.
+
+Run from the project directory:
+    python benchmarks/bench_track_store.py [tracks]
+"""
+import json
+import random
+import string
+import sys
+import time
+import tracemalloc
+
+import common  # noqa: F401  (puts the project directory on sys.path)
+from track_store import TrackList
+
+
+def synthetic_tracks(count):
+    rng = random.Random(42)
+    alphabet = string.ascii_letters + string.digits
+    for i in range(count):
+        yield {
+            "id": "".join(rng.choice(alphabet) for _ in range(22)),
+            "name": f"Track {i} ({rng.choice(['Live', 'Remastered', 'Radio Edit'])})",
+            "artist": ", ".join(f"Artist {rng.randrange(5000)}" for _ in range(rng.randint(1, 3))),
+            "added_at": f"20{rng.randint(10, 24)}-0{rng.randint(1, 9)}-1{rng.randint(0, 9)}T12:00:00Z"
+        }
+
+
+def measure(build):
+    """(result, bytes retained, seconds); timed separately since tracemalloc slows allocation"""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size, elapsed
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    source = list(synthetic_tracks(count))
+    other = source[count // 2:] + list(synthetic_tracks(count // 10))
+    payload = json.dumps(source)  # Both representations are built from freshly decoded JSON, as from the API
+
+    dicts, dict_bytes, dict_build = measure(lambda: json.loads(payload))
+    packed, packed_bytes, packed_build = measure(lambda: TrackList(json.loads(payload)))
+    other_packed = TrackList(other)
+
+    start = time.perf_counter()
+    other_ids = {track["id"] for track in other}
+    missing_dicts = [track["id"] for track in dicts if track["id"] not in other_ids]
+    dict_diff = time.perf_counter() - start
+
+    start = time.perf_counter()
+    missing_packed = packed.difference(other_packed)
+    packed_diff = time.perf_counter() - start
+    assert missing_dicts == missing_packed
+
+    print(f"Tracks: {count}")
+    print(f"   list of dicts: {dict_bytes / 1e6:8.2f} MB  build {dict_build * 1000:7.1f} ms  "
+          f"diff {dict_diff * 1000:6.1f} ms")
+    print(f"   TrackList:     {packed_bytes / 1e6:8.2f} MB  build {packed_build * 1000:7.1f} ms  "
+          f"diff {packed_diff * 1000:6.1f} ms")
+    print(f"   TrackList is {dict_bytes / packed_bytes:.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
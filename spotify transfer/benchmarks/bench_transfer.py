@@ -0,0 +1,95 @@
+"""Throughput of transfer_liked_songs and transfer_playlists against the mock API.
+
+Run from the project directory:
+    python benchmarks/bench_transfer.py [--sizes 1000 10000 100000] [--latency 0.02]
+
+Each size gets a fresh mock server whose source account has that many
+liked songs and the same number of tracks spread over playlists. The rate
+limiter is opened up (--rate) so the numbers show the tool's own overhead;
+pass --rate 0 to keep the tool's default limits.
+"""
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+import common
+from mock_spotify import MockSpotify
+from rate_limiter import RateLimiter
+from spotify_client import SpotifyClient
+
+
+def make_library(transfer, mock, api_base, user_id, rate):
+    rate_limiter = RateLimiter(rate, max_rate=rate) if rate else None
+    client = SpotifyClient(mock.token_for(user_id), api_base=api_base, rate_limiter=rate_limiter)
+    return transfer.AccountLibrary(client)
+
+
+def timed(fn):
+    """(result, seconds) with the tool's console output swallowed"""
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        start = time.perf_counter()
+        result = fn()
+        return result, time.perf_counter() - start
+
+
+def run_size(transfer, size, args):
+    playlist_count = max(1, size // args.playlist_size)
+    mock = MockSpotify(args.latency, throttle_rate=args.throttle_rate)
+    mock.add_account("source_user", size, [(f"Playlist {i + 1}", args.playlist_size) for i in range(playlist_count)])
+    mock.add_account("dest_user")
+    api_base, _ = mock.start()
+
+    try:
+        source = make_library(transfer, mock, api_base, "source_user", args.rate)
+        dest = make_library(transfer, mock, api_base, "dest_user", args.rate)
+
+        liked, liked_seconds = timed(lambda: transfer.transfer_liked_songs(source, dest))
+        playlists, playlist_seconds = timed(lambda: transfer.transfer_playlists(source, dest))
+    finally:
+        mock.shutdown()
+
+    dest_account = mock.accounts["dest_user"]
+    playlist_tracks = sum(len(p["tracks"]) for p in dest_account.playlists.values())
+    if not (liked["success"] and playlists["success"]) or len(dest_account.liked) != size \
+            or playlist_tracks != playlist_count * args.playlist_size:
+        raise RuntimeError(f"transfer of {size} tracks was incomplete")
+
+    return [
+        ("transfer_liked_songs", size, liked_seconds),
+        ("transfer_playlists", playlist_tracks, playlist_seconds)
+    ], mock.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--playlist-size", type=int, default=1000, help="tracks per source playlist")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds the mock adds to every response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="requests/second per account (0: the tool's default rate limits)")
+    args = parser.parse_args()
+
+    transfer = common.load_transfer_module()
+    print(f"{'operation':<22}{'tracks':>9}{'wall time':>12}{'tracks/sec':>12}")
+
+    # Playlist maps, histories and caches the tool writes stay out of the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            for size in args.sizes:
+                rows, stats = run_size(transfer, size, args)
+                for operation, tracks, seconds in rows:
+                    print(f"{operation:<22}{tracks:>9}{seconds:>11.2f}s{tracks / seconds:>12.0f}")
+                throttled = f", {stats['throttled']} throttled" if stats["throttled"] else ""
+                print(f"   {stats['requests']} requests{throttled}")
+        finally:
+            os.chdir(cwd)
+
+
+if __name__ == "__main__":
+    main()
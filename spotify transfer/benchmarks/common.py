@@ -0,0 +1,16 @@
+import importlib.util
+import os
+import sys
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if PACKAGE_DIR not in sys.path:
+    sys.path.insert(0, PACKAGE_DIR)
+
+
+def load_transfer_module():
+    """Import 'spotify transfer.py' (the file name is not a valid module name)"""
+    path = os.path.join(PACKAGE_DIR, "spotify transfer.py")
+    spec = importlib.util.spec_from_file_location("spotify_transfer", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,503 @@
+"""Local stand-in for the parts of the Spotify Web API this tool uses.
+
+Run from the project directory to serve a synthetic library:
+    python benchmarks/mock_spotify.py --liked 10000 --playlists 20 --playlist-size 200
+
+Accounts are told apart by their bearer token ("token-<user id>"), so one
+server can play both the source and the destination account. POST
+/api/token with refresh_token "refresh-<user id>" returns that token.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlencode, urlparse, parse_qsl
+
+ADDED_AT_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+MARKETS = ["AD", "AR", "AT", "AU", "BE", "BR", "CA", "CH", "DE", "DK", "ES", "FI", "FR", "GB",
+           "IE", "IT", "JP", "MX", "NL", "NO", "NZ", "PL", "PT", "SE", "US"]
+PAGE_LIMITS = {"tracks": 50, "playlists": 50, "playlist_tracks": 100}  # Spotify's maximum limit per endpoint
+WRITE_LIMITS = {"save_tracks": 50, "playlist_tracks": 100}  # Spotify's maximum IDs/URIs per write
+
+
+def synthetic_id(tag, number):
+    """22-character track ID that is unique per (tag, number)"""
+    return f"{tag}{number:0{22 - len(tag)}d}"
+
+
+def track_object(track_id):
+    """Track object shaped (and sized) like a full Spotify track"""
+    seed = sum(map(ord, track_id))
+    return {
+        "id": track_id,
+        "uri": f"spotify:track:{track_id}",
+        "name": f"Track {track_id[-6:]}",
+        "type": "track",
+        "duration_ms": 180000 + seed * 37 % 120000,
+        "explicit": False,
+        "popularity": seed % 100,
+        "is_local": False,
+        "available_markets": MARKETS,
+        "external_ids": {"isrc": f"US{track_id[-10:]}"},
+        "external_urls": {"spotify": f"https://open.spotify.com/track/{track_id}"},
+        "href": f"https://api.spotify.com/v1/tracks/{track_id}",
+        "artists": [{
+            "id": f"artist{track_id[-16:]}",
+            "name": f"Artist {track_id[-3:]}",
+            "type": "artist",
+            "uri": f"spotify:artist:artist{track_id[-16:]}"
+        }],
+        "album": {
+            "id": f"album{track_id[-17:]}",
+            "name": f"Album {track_id[-4:]}",
+            "album_type": "album",
+            "release_date": "2020-01-01",
+            "available_markets": MARKETS,
+            "images": [{"url": f"https://i.scdn.co/image/{track_id}{size}", "height": size, "width": size}
+                       for size in (640, 300, 64)]
+        }
+    }
+
+
+def parse_fields(fields):
+    """Parse a Spotify `fields` filter, e.g. "total,items(track(id,name))", into a nested dict"""
+    tree, stack, name = {}, [], ""
+    for char in fields + ",":
+        if char == "(":
+            stack.append(tree)
+            tree = tree.setdefault(name.strip(), {})
+            name = ""
+        elif char in ",)":
+            if name.strip():
+                tree.setdefault(name.strip(), None)
+            name = ""
+            if char == ")":
+                tree = stack.pop()
+        else:
+            name += char
+    return tree
+
+
+def select_fields(value, tree):
+    """Keep only the fields in tree (from parse_fields); lists are filtered item by item"""
+    if tree is None:
+        return value
+    if isinstance(value, list):
+        return [select_fields(item, tree) for item in value]
+    if not isinstance(value, dict):
+        return value
+    return {key: select_fields(value[key], subtree) for key, subtree in tree.items() if key in value}
+
+
+class MockAccount:
+    def __init__(self, user_id, country="US"):
+        self.user_id = user_id
+        self.country = country
+        self.liked = []        # [track ID, added_at], newest first like the real API
+        self.liked_ids = set()
+        self.playlists = {}    # playlist ID -> playlist dict, in creation order
+
+    def save_tracks(self, track_ids, added_at=None):
+        added_at = added_at or datetime.now(timezone.utc).strftime(ADDED_AT_FORMAT)
+        new_ids = [track_id for track_id in track_ids if track_id not in self.liked_ids]
+        self.liked[:0] = [[track_id, added_at] for track_id in reversed(new_ids)]
+        self.liked_ids.update(new_ids)
+
+    def add_playlist(self, playlist_id, name, description="", public=False, track_ids=()):
+        added_at = datetime.now(timezone.utc).strftime(ADDED_AT_FORMAT)
+        self.playlists[playlist_id] = {
+            "id": playlist_id,
+            "name": name,
+            "description": description,
+            "public": public,
+            "tracks": [[track_id, added_at] for track_id in track_ids],
+            "version": 0
+        }
+        return self.playlists[playlist_id]
+
+
+class MockSpotify:
+    """Synthetic Spotify accounts served over HTTP.
+
+    latency is added to every response, page_limits/write_limits cap
+    request sizes like the real API (400 when exceeded), and
+    throttle_rate is the fraction of requests answered with 429 and a
+    Retry-After of retry_after seconds. Writes that include one of
+    bad_ids fail as a whole with 400, like an invalid ID does, and
+    /tracks lookups return null for them. With a market, lookups report
+    unavailable IDs as unplayable and relinked IDs (old -> new) as the
+    new track with linked_from set.
+    """
+
+    def __init__(self, latency=0.0, page_limits=None, write_limits=None, throttle_rate=0.0,
+                 retry_after=1, seed=0, bad_ids=(), unavailable=(), relinked=None):
+        self.latency = latency
+        self.page_limits = dict(PAGE_LIMITS, **(page_limits or {}))
+        self.write_limits = dict(WRITE_LIMITS, **(write_limits or {}))
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.bad_ids = set(bad_ids)
+        self.unavailable = set(unavailable)
+        self.relinked = dict(relinked or {})
+        self.random = random.Random(seed)
+        self.accounts = {}
+        self.lock = threading.RLock()  # Endpoint handlers run under it and may take it again
+        self.stats = {"requests": 0, "throttled": 0}
+        self.request_log = []  # (epoch seconds, method, path) of every request, in arrival order
+        self.server = None
+        self.next_playlist = 0
+
+    def add_account(self, user_id, liked=0, playlists=(), country="US"):
+        """Create an account with `liked` saved tracks and playlists given as (name, track count)"""
+        account = MockAccount(user_id, country)
+        tag = re.sub(r"[^A-Za-z0-9]", "", user_id)[:6]
+        start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        account.liked = [[synthetic_id(tag + "L", i), (start - timedelta(minutes=i)).strftime(ADDED_AT_FORMAT)]
+                         for i in range(liked)]
+        account.liked_ids = {track_id for track_id, _ in account.liked}
+        for number, (name, size) in enumerate(playlists):
+            account.add_playlist(self.new_playlist_id(), name,
+                                 track_ids=[synthetic_id(f"{tag}P{number}x", i) for i in range(size)])
+        self.accounts[user_id] = account
+        return account
+
+    def new_playlist_id(self):
+        with self.lock:
+            self.next_playlist += 1
+            return f"mockplaylist{self.next_playlist:010d}"
+
+    @staticmethod
+    def token_for(user_id):
+        return f"token-{user_id}"
+
+    @staticmethod
+    def refresh_token_for(user_id):
+        return f"refresh-{user_id}"
+
+    def start(self, port=0):
+        """Serve in a background thread; returns (API base URL, accounts base URL)"""
+        self.server = ThreadingHTTPServer(("127.0.0.1", port), MockHandler)
+        self.server.daemon_threads = True
+        self.server.mock = self
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        return f"{base}/v1", base
+
+    def shutdown(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def should_throttle(self):
+        with self.lock:
+            self.stats["requests"] += 1
+            if self.throttle_rate and self.random.random() < self.throttle_rate:
+                self.stats["throttled"] += 1
+                return True
+        return False
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Allow keep-alive
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("POST", r"/api/token", "token"),
+        ("GET", r"/v1/me", "me"),
+        ("GET", r"/v1/me/tracks", "get_saved_tracks"),
+        ("PUT", r"/v1/me/tracks", "save_tracks"),
+        ("GET", r"/v1/me/tracks/contains", "contains_tracks"),
+        ("GET", r"/v1/me/playlists", "get_playlists"),
+        ("GET", r"/v1/tracks", "get_tracks"),
+        ("POST", r"/v1/users/([^/]+)/playlists", "create_playlist"),
+        ("GET", r"/v1/playlists/([^/]+)/tracks", "get_playlist_tracks"),
+        ("POST", r"/v1/playlists/([^/]+)/tracks", "add_playlist_tracks"),
+        ("DELETE", r"/v1/playlists/([^/]+)/tracks", "remove_playlist_tracks"),
+        ("PUT", r"/v1/playlists/([^/]+)/tracks", "reorder_playlist_tracks"),
+    ]
+
+    @property
+    def mock(self):
+        return self.server.mock
+
+    def do_GET(self):
+        self.dispatch("GET")
+
+    def do_POST(self):
+        self.dispatch("POST")
+
+    def do_PUT(self):
+        self.dispatch("PUT")
+
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+
+    def log_message(self, format, *args):
+        pass  # Suppress server logs
+
+    # ---- Plumbing ----
+    def send_json(self, status, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        if self.command == "GET" and status == 200:
+            # Spotify supports conditional GETs; an unchanged response costs a bodyless 304
+            etag = f'"{hashlib.md5(data).hexdigest()}"'
+            headers = dict(headers or {}, ETag=etag)
+            if self.headers.get("If-None-Match") == etag:
+                status, data = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_error_json(self, status, message):
+        self.send_json(status, {"error": {"status": status, "message": message}})
+
+    def read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+            return dict(parse_qsl(raw.decode("utf-8")))
+        return json.loads(raw) if raw else {}
+
+    def dispatch(self, method):
+        url = urlparse(self.path)
+        self.query = dict(parse_qsl(url.query))
+        self.body = self.read_body()
+        self.mock.request_log.append((time.time(), method, url.path))
+
+        if self.mock.latency:
+            time.sleep(self.mock.latency)
+        if self.mock.should_throttle():
+            return self.send_json(429, {"error": {"status": 429, "message": "API rate limit exceeded"}},
+                                  {"Retry-After": str(self.mock.retry_after)})
+
+        for route_method, pattern, handler in self.ROUTES:
+            match = re.fullmatch(pattern, url.path)
+            if match and route_method == method:
+                account = None
+                if handler != "token":
+                    account = self.authorized_account()
+                    if account is None:
+                        return self.send_error_json(401, "Invalid access token")
+                with self.mock.lock:
+                    return getattr(self, handler)(account, *match.groups())
+        self.send_error_json(404, "Service not found")
+
+    def authorized_account(self):
+        token = self.headers.get("Authorization", "").removeprefix("Bearer ")
+        return self.mock.accounts.get(token.removeprefix("token-")) if token.startswith("token-") else None
+
+    def page_bounds(self, kind):
+        limit = int(self.query.get("limit", 20))
+        offset = int(self.query.get("offset", 0))
+        if not 1 <= limit <= self.mock.page_limits[kind]:
+            self.send_error_json(400, "Invalid limit")
+            return None
+        return offset, limit
+
+    def send_page(self, items, offset, limit, total, filterable=False):
+        """Send one page; filterable endpoints honor the `fields` query parameter"""
+        base = f"http://{self.headers.get('Host')}{urlparse(self.path).path}"
+        params = dict(self.query, limit=limit)
+        page = {
+            "href": f"{base}?{urlencode(dict(params, offset=offset))}",
+            "items": items,
+            "limit": limit,
+            "offset": offset,
+            "total": total,
+            "next": f"{base}?{urlencode(dict(params, offset=offset + limit))}" if offset + limit < total else None,
+            "previous": f"{base}?{urlencode(dict(params, offset=max(offset - limit, 0)))}" if offset else None
+        }
+        if filterable and self.query.get("fields"):
+            page = select_fields(page, parse_fields(self.query["fields"]))
+        self.send_json(200, page)
+
+    def playlist_or_404(self, playlist_id):
+        for account in self.mock.accounts.values():
+            if playlist_id in account.playlists:
+                return account.playlists[playlist_id]
+        self.send_error_json(404, "Not found.")
+        return None
+
+    # ---- Endpoints ----
+    def token(self, account):
+        refresh = self.body.get("refresh_token") or self.body.get("code", "")
+        user_id = refresh.removeprefix("refresh-")
+        if user_id not in self.mock.accounts:
+            return self.send_json(400, {"error": "invalid_grant"})
+        self.send_json(200, {
+            "access_token": self.mock.token_for(user_id),
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "refresh_token": self.mock.refresh_token_for(user_id)
+        })
+
+    def me(self, account):
+        self.send_json(200, {
+            "id": account.user_id,
+            "display_name": account.user_id,
+            "country": account.country,
+            "followers": {"total": 0},
+            "product": "premium"
+        })
+
+    def get_saved_tracks(self, account):
+        bounds = self.page_bounds("tracks")
+        if bounds:
+            offset, limit = bounds
+            items = [{"added_at": added_at, "track": track_object(track_id)}
+                     for track_id, added_at in account.liked[offset:offset + limit]]
+            self.send_page(items, offset, limit, len(account.liked))
+
+    def save_tracks(self, account):
+        track_ids = self.body.get("ids", [])
+        if len(track_ids) > self.mock.write_limits["save_tracks"]:
+            return self.send_error_json(400, "Too many ids requested")
+        if self.mock.bad_ids.intersection(track_ids):
+            return self.send_error_json(400, "Invalid base62 id")
+        account.save_tracks(track_ids)
+        self.send_json(200)
+
+    def contains_tracks(self, account):
+        track_ids = self.query.get("ids", "").split(",")
+        if len(track_ids) > self.mock.write_limits["save_tracks"]:
+            return self.send_error_json(400, "Too many ids requested")
+        self.send_json(200, [track_id in account.liked_ids for track_id in track_ids])
+
+    def get_tracks(self, account):
+        track_ids = self.query.get("ids", "").split(",")
+        if len(track_ids) > 50:
+            return self.send_error_json(400, "Too many ids requested")
+        market = self.query.get("market")
+        tracks = []
+        for track_id in track_ids:
+            if track_id in self.mock.bad_ids:
+                tracks.append(None)
+                continue
+            track = track_object(self.mock.relinked.get(track_id, track_id) if market else track_id)
+            if market:
+                track["is_playable"] = track_id not in self.mock.unavailable
+                if track["id"] != track_id:
+                    track["linked_from"] = {"id": track_id, "type": "track", "uri": f"spotify:track:{track_id}"}
+                del track["available_markets"]  # Spotify leaves it out when a market is given
+            tracks.append(track)
+        self.send_json(200, {"tracks": tracks})
+
+    def get_playlists(self, account):
+        bounds = self.page_bounds("playlists")
+        if bounds:
+            offset, limit = bounds
+            playlists = list(account.playlists.values())
+            items = [{
+                "id": playlist["id"],
+                "name": playlist["name"],
+                "description": playlist["description"],
+                "public": playlist["public"],
+                "owner": {"id": account.user_id, "display_name": account.user_id},
+                "snapshot_id": f"snapshot{playlist['version']}",
+                "tracks": {"total": len(playlist["tracks"])}
+            } for playlist in playlists[offset:offset + limit]]
+            self.send_page(items, offset, limit, len(playlists))
+
+    def create_playlist(self, account, user_id):
+        if user_id != account.user_id:
+            return self.send_error_json(403, "You cannot create a playlist for another user")
+        playlist = account.add_playlist(self.mock.new_playlist_id(), self.body.get("name", ""),
+                                        self.body.get("description", ""), self.body.get("public", True))
+        self.send_json(201, {"id": playlist["id"], "name": playlist["name"], "snapshot_id": "snapshot0"})
+
+    def get_playlist_tracks(self, account, playlist_id):
+        bounds = self.page_bounds("playlist_tracks")
+        playlist = bounds and self.playlist_or_404(playlist_id)
+        if playlist:
+            offset, limit = bounds
+            items = [{
+                "added_at": added_at,
+                "added_by": {"id": account.user_id, "type": "user", "uri": f"spotify:user:{account.user_id}"},
+                "is_local": False,
+                "track": track_object(track_id)
+            } for track_id, added_at in playlist["tracks"][offset:offset + limit]]
+            self.send_page(items, offset, limit, len(playlist["tracks"]), filterable=True)
+
+    def changed(self, playlist):
+        playlist["version"] += 1
+        self.send_json(201 if self.command == "POST" else 200, {"snapshot_id": f"snapshot{playlist['version']}"})
+
+    def add_playlist_tracks(self, account, playlist_id):
+        playlist = self.playlist_or_404(playlist_id)
+        if playlist:
+            uris = self.body.get("uris", [])
+            if len(uris) > self.mock.write_limits["playlist_tracks"]:
+                return self.send_error_json(400, "Too many tracks requested")
+            if self.mock.bad_ids.intersection(uri.rsplit(":", 1)[-1] for uri in uris):
+                return self.send_error_json(400, "Invalid base62 id")
+            position = self.body.get("position", len(playlist["tracks"]))
+            added_at = datetime.now(timezone.utc).strftime(ADDED_AT_FORMAT)
+            playlist["tracks"][position:position] = [[uri.rsplit(":", 1)[-1], added_at] for uri in uris]
+            self.changed(playlist)
+
+    def remove_playlist_tracks(self, account, playlist_id):
+        playlist = self.playlist_or_404(playlist_id)
+        if playlist:
+            removed = {track["uri"].rsplit(":", 1)[-1] for track in self.body.get("tracks", [])}
+            playlist["tracks"] = [track for track in playlist["tracks"] if track[0] not in removed]
+            self.changed(playlist)
+
+    def reorder_playlist_tracks(self, account, playlist_id):
+        playlist = self.playlist_or_404(playlist_id)
+        if playlist:
+            tracks = playlist["tracks"]
+            start = self.body["range_start"]
+            length = self.body.get("range_length", 1)
+            insert_before = self.body["insert_before"]
+            moved = tracks[start:start + length]
+            if insert_before > start:
+                tracks[insert_before:insert_before] = moved
+                del tracks[start:start + length]
+            else:
+                del tracks[start:start + length]
+                tracks[insert_before:insert_before] = moved
+            self.changed(playlist)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a synthetic Spotify library locally")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--users", nargs="+", default=["source_user", "dest_user"],
+                        help="account user IDs; the first gets the synthetic library")
+    parser.add_argument("--liked", type=int, default=1000, help="liked songs in the first account")
+    parser.add_argument("--playlists", type=int, default=5, help="playlists in the first account")
+    parser.add_argument("--playlist-size", type=int, default=100, help="tracks per playlist")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    args = parser.parse_args()
+
+    mock = MockSpotify(args.latency, throttle_rate=args.throttle_rate, retry_after=args.retry_after)
+    mock.add_account(args.users[0], args.liked,
+                     [(f"Playlist {i + 1}", args.playlist_size) for i in range(args.playlists)])
+    for user_id in args.users[1:]:
+        mock.add_account(user_id)
+
+    api_base, accounts_base = mock.start(args.port)
+    print(f"Mock Spotify API at {api_base}")
+    print(f'   export SPOTIFY_API_BASE="{api_base}" SPOTIFY_ACCOUNTS_BASE="{accounts_base}"')
+    for user_id in args.users:
+        print(f"   {user_id}: access token {mock.token_for(user_id)}, "
+              f"refresh token {mock.refresh_token_for(user_id)}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        mock.shutdown()
+
+
+if __name__ == "__main__":
+    main()
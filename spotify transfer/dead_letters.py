@@ -0,0 +1,54 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+DEAD_LETTER_FILE = "dead_letters.jsonl"
+
+
+class DeadLetterQueue:
+    """Tracks that could not be saved, one JSON line per track with the reason.
+
+    Liked-song entries carry the destination user ID ("dest"), playlist
+    entries the playlist ID ("playlist_id"). Lines are fsync'd as they are
+    written so nothing is lost if the run dies afterwards.
+    """
+
+    def __init__(self, path=DEAD_LETTER_FILE):
+        self.path = path
+        self.lock = threading.Lock()
+
+    def add(self, track_ids, status, reason, **target):
+        timestamp = datetime.now().isoformat()
+        lines = "".join(
+            json.dumps(dict(target, track_id=track_id, status=status, reason=reason, timestamp=timestamp)) + "\n"
+            for track_id in track_ids)
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(lines)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def load(self):
+        entries = []
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break  # Torn final line from a crash mid-write
+        except FileNotFoundError:
+            pass
+        return entries
+
+    def replace(self, entries):
+        """Atomically rewrite the queue with only the given entries"""
+        temp_path = self.path + ".tmp"
+        with self.lock:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    f.write(json.dumps(entry) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_path, self.path)
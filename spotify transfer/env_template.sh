@@ -10,4 +10,35 @@ SPOTIFY_ACCOUNT2_CLIENT_ID=your_second_spotify_app_client_id_here
 SPOTIFY_ACCOUNT2_CLIENT_SECRET=your_second_spotify_app_client_secret_here
 
 # OAuth Redirect URI (don't change this unless you know what you're doing)
-SPOTIFY_REDIRECT_URI=http://127.0.0.1:8888/callback
\ No newline at end of file
+SPOTIFY_REDIRECT_URI=http://127.0.0.1:8888/callback
+
+# HTTP connection pool size per account (optional)
+SPOTIFY_HTTP_POOL_SIZE=20
+
+# Starting and maximum request rate per account, in requests/second (optional)
+SPOTIFY_RATE_LIMIT=10
+SPOTIFY_MAX_RATE_LIMIT=50
+
+# Concurrent page requests when listing tracks and playlists (optional)
+SPOTIFY_PAGE_WORKERS=4
+
+# Playlists transferred concurrently (optional)
+SPOTIFY_PLAYLIST_WORKERS=4
+
+# Local library cache location and size limit in tracks (optional; bypass with --no-cache)
+SPOTIFY_CACHE_FILE=library_cache.db
+SPOTIFY_CACHE_MAX_TRACKS=500000
+
+# Rotate transfer_history.jsonl once it reaches this many bytes (optional)
+SPOTIFY_HISTORY_MAX_BYTES=10485760
+
+# Source pages read ahead of the destination writer (optional)
+SPOTIFY_PIPELINE_DEPTH=4
+
+# Cache of API responses revalidated with ETags, and its size limit in bytes (optional; bypass with --no-http-cache)
+SPOTIFY_HTTP_CACHE_FILE=http_cache.db
+SPOTIFY_HTTP_CACHE_MAX_BYTES=104857600
+
+# Track availability lookups per market, and how long they stay valid in seconds (optional)
+SPOTIFY_AVAILABILITY_CACHE_FILE=availability_cache.db
+SPOTIFY_AVAILABILITY_TTL=604800
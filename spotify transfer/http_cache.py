@@ -0,0 +1,92 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+HTTP_CACHE_FILE = os.getenv("SPOTIFY_HTTP_CACHE_FILE", "http_cache.db")
+DEFAULT_MAX_BYTES = int(os.getenv("SPOTIFY_HTTP_CACHE_MAX_BYTES", str(100 * 1024 * 1024)))
+KEPT_HEADERS = ("Content-Type", "ETag")
+
+
+class HttpCache:
+    """On-disk store of GET responses that carried an ETag.
+
+    SpotifyClient revalidates every hit with If-None-Match, so a cached
+    body is only used after the API answered 304 Not Modified. Size is
+    bounded by total body bytes; the least recently used responses are
+    evicted first.
+    """
+
+    def __init__(self, path=HTTP_CACHE_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used);
+        """)
+
+    def get(self, key):
+        """(etag, headers, body) stored for key, or None"""
+        with self.lock:
+            row = self.db.execute("SELECT etag, headers, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2]
+
+    def touch(self, key):
+        """Mark a cached response as just used (after a 304 served it)"""
+        with self.lock:
+            self.db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.db.commit()
+
+    def put(self, key, res):
+        body = res.content
+        if len(body) > self.max_bytes:
+            return
+        headers = {name: res.headers[name] for name in KEPT_HEADERS if name in res.headers}
+        with self.lock:
+            self.db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, res.headers["ETag"], json.dumps(headers), body, len(body), time.time()))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self.db.execute("SELECT key, size FROM responses ORDER BY last_used").fetchall():
+            self.db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+
+
+def cached_response(not_modified, headers, body):
+    """A 200 response rebuilt from the cache for a request that was answered 304"""
+    res = requests.Response()
+    res.status_code = 200
+    res.reason = "OK"
+    res.headers = CaseInsensitiveDict(headers)
+    res._content = body
+    res.encoding = "utf-8"
+    res.url = not_modified.url
+    res.request = not_modified.request
+    res.elapsed = not_modified.elapsed
+    res.from_cache = True
+    return res
@@ -0,0 +1,109 @@
+import os
+import sqlite3
+import threading
+import time
+
+from track_store import TrackList
+
+SCHEMA_VERSION = 2  # Bump when the stored track format changes
+CACHE_FILE = os.getenv("SPOTIFY_CACHE_FILE", "library_cache.db")
+DEFAULT_MAX_TRACKS = int(os.getenv("SPOTIFY_CACHE_MAX_TRACKS", "500000"))
+
+
+class LibraryCache:
+    """On-disk cache of playlist tracks (keyed on snapshot_id) and saved tracks.
+
+    Size is bounded by the total number of cached tracks; the least recently
+    used entries are evicted first.
+    """
+
+    def __init__(self, path=CACHE_FILE, max_tracks=DEFAULT_MAX_TRACKS):
+        self.max_tracks = max_tracks
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        if self.db.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+            self.db.executescript(f"""
+                DROP TABLE IF EXISTS playlist_tracks;
+                DROP TABLE IF EXISTS saved_tracks;
+                PRAGMA user_version = {SCHEMA_VERSION};
+            """)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS playlist_tracks (
+                playlist_id TEXT PRIMARY KEY,
+                snapshot_id TEXT NOT NULL,
+                tracks BLOB NOT NULL,
+                track_count INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS saved_tracks (
+                user_id TEXT PRIMARY KEY,
+                high_water TEXT NOT NULL,
+                tracks BLOB NOT NULL,
+                track_count INTEGER NOT NULL,
+                last_used REAL NOT NULL
+            );
+        """)
+
+    def get_playlist_tracks(self, playlist_id, snapshot_id):
+        """Cached tracks for this exact playlist version, or None"""
+        with self.lock:
+            row = self.db.execute(
+                "SELECT tracks FROM playlist_tracks WHERE playlist_id = ? AND snapshot_id = ?",
+                (playlist_id, snapshot_id)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE playlist_tracks SET last_used = ? WHERE playlist_id = ?",
+                            (time.time(), playlist_id))
+            self.db.commit()
+        return TrackList.from_bytes(row[0])
+
+    def put_playlist_tracks(self, playlist_id, snapshot_id, tracks):
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO playlist_tracks VALUES (?, ?, ?, ?, ?)",
+                (playlist_id, snapshot_id, tracks.to_bytes(), len(tracks), time.time()))
+            self._evict()
+            self.db.commit()
+
+    def has_saved_tracks(self, user_id):
+        with self.lock:
+            return self.db.execute("SELECT 1 FROM saved_tracks WHERE user_id = ?", (user_id,)).fetchone() is not None
+
+    def get_saved_tracks(self, user_id):
+        """(tracks newest first, latest added_at) cached for an account, or None"""
+        with self.lock:
+            row = self.db.execute("SELECT tracks, high_water FROM saved_tracks WHERE user_id = ?",
+                                  (user_id,)).fetchone()
+            if row is None:
+                return None
+            self.db.execute("UPDATE saved_tracks SET last_used = ? WHERE user_id = ?", (time.time(), user_id))
+            self.db.commit()
+        return TrackList.from_bytes(row[0]), row[1]
+
+    def put_saved_tracks(self, user_id, tracks):
+        high_water = tracks.latest_added_at() or ""
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO saved_tracks VALUES (?, ?, ?, ?, ?)",
+                (user_id, high_water, tracks.to_bytes(), len(tracks), time.time()))
+            self._evict()
+            self.db.commit()
+
+    def _evict(self):
+        entries = self.db.execute("""
+            SELECT 'playlist_tracks', playlist_id, track_count, last_used FROM playlist_tracks
+            UNION ALL
+            SELECT 'saved_tracks', user_id, track_count, last_used FROM saved_tracks
+            ORDER BY last_used
+        """).fetchall()
+        total = sum(entry[2] for entry in entries)
+
+        for table, key, track_count, _ in entries:
+            if total <= self.max_tracks:
+                break
+            column = "playlist_id" if table == "playlist_tracks" else "user_id"
+            self.db.execute(f"DELETE FROM {table} WHERE {column} = ?", (key,))
+            total -= track_count
+
+    def close(self):
+        self.db.close()
@@ -0,0 +1,163 @@
+import json
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # Seconds
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)  # Response bytes
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket, cumulated only on export"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last bucket is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """[(upper bound, observations <= bound)], ending with ("+Inf", count)"""
+        total = 0
+        result = []
+        for bound, count in zip(list(self.bounds) + ["+Inf"], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def to_dict(self):
+        return {"count": self.count, "sum": round(self.sum, 6),
+                "buckets": {str(bound): count for bound, count in self.cumulative()}}
+
+
+class EndpointStats:
+    __slots__ = ("statuses", "retries", "errors", "throttle_wait", "bytes_sent", "bytes_received",
+                 "latency", "size")
+
+    def __init__(self):
+        self.statuses = {}
+        self.retries = 0
+        self.errors = 0
+        self.throttle_wait = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.size = Histogram(SIZE_BUCKETS)
+
+
+class Metrics:
+    """Per-endpoint request counters and histograms, fed by SpotifyClient hooks.
+
+    Register with client.hooks.append(metrics.record). One instance can be
+    shared by several clients and threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def record(self, event):
+        with self.lock:
+            stats = self.endpoints.get(event.endpoint)
+            if stats is None:
+                stats = self.endpoints[event.endpoint] = EndpointStats()
+            status = str(event.status) if event.status is not None else "error"
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.retries += event.retries
+            stats.errors += event.error is not None
+            stats.throttle_wait += event.throttle_wait
+            stats.bytes_sent += event.bytes_sent
+            stats.bytes_received += event.bytes_received
+            stats.latency.observe(event.latency)
+            stats.size.observe(event.bytes_received)
+
+    def to_dict(self):
+        with self.lock:
+            endpoints = {
+                endpoint: {
+                    "requests": stats.latency.count,
+                    "statuses": dict(stats.statuses),
+                    "retries": stats.retries,
+                    "errors": stats.errors,
+                    "throttle_wait_seconds": round(stats.throttle_wait, 6),
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                    "latency_seconds": stats.latency.to_dict(),
+                    "response_bytes": stats.size.to_dict()
+                }
+                for endpoint, stats in sorted(self.endpoints.items())
+            }
+        totals = {key: sum(e[key] for e in endpoints.values())
+                  for key in ("requests", "retries", "errors", "bytes_sent", "bytes_received")}
+        totals["latency_seconds"] = round(sum(e["latency_seconds"]["sum"] for e in endpoints.values()), 6)
+        totals["throttle_wait_seconds"] = round(sum(e["throttle_wait_seconds"] for e in endpoints.values()), 6)
+        return {"totals": totals, "time_seconds": self._time_spent(endpoints), "endpoints": endpoints}
+
+    @staticmethod
+    def _time_spent(endpoints):
+        """HTTP time split into reads, writes and token refreshes, plus rate limiter waits"""
+        spent = {"reads": 0.0, "writes": 0.0, "token_refresh": 0.0, "throttle_wait": 0.0}
+        for endpoint, stats in endpoints.items():
+            method, path = endpoint.split(" ", 1)
+            kind = "token_refresh" if path == "/api/token" else "reads" if method == "GET" else "writes"
+            spent[kind] += stats["latency_seconds"]["sum"]
+            spent["throttle_wait"] += stats["throttle_wait_seconds"]
+        return {kind: round(seconds, 6) for kind, seconds in spent.items()}
+
+    def to_prometheus(self):
+        """Metrics in the Prometheus text exposition format"""
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        with self.lock:
+            endpoints = sorted(self.endpoints.items())
+
+            family("spotify_requests_total", "counter", "API calls by endpoint and final status")
+            for endpoint, stats in endpoints:
+                for status, count in sorted(stats.statuses.items()):
+                    lines.append(f"spotify_requests_total{{endpoint={_label(endpoint)},status=\"{status}\"}} {count}")
+
+            for name, attribute, help_text in (
+                    ("spotify_request_retries_total", "retries", "Retried attempts after 401, 429 or 503"),
+                    ("spotify_request_errors_total", "errors", "Calls that failed without a response"),
+                    ("spotify_throttle_wait_seconds_total", "throttle_wait", "Time spent waiting on the rate limiter"),
+                    ("spotify_request_bytes_total", "bytes_sent", "Request body bytes sent"),
+                    ("spotify_response_bytes_total", "bytes_received", "Response body bytes received")):
+                family(name, "counter", help_text)
+                for endpoint, stats in endpoints:
+                    lines.append(f"{name}{{endpoint={_label(endpoint)}}} {getattr(stats, attribute)}")
+
+            for name, attribute, help_text in (
+                    ("spotify_request_duration_seconds", "latency", "HTTP time per call, summed over attempts"),
+                    ("spotify_response_size_bytes", "size", "Response body size per call")):
+                family(name, "histogram", help_text)
+                for endpoint, stats in endpoints:
+                    histogram = getattr(stats, attribute)
+                    for bound, count in histogram.cumulative():
+                        lines.append(f"{name}_bucket{{endpoint={_label(endpoint)},le=\"{bound}\"}} {count}")
+                    lines.append(f"{name}_sum{{endpoint={_label(endpoint)}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{endpoint={_label(endpoint)}}} {histogram.count}")
+
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """Write metrics to path: Prometheus text for .prom files, JSON otherwise"""
+        with open(path, "w", encoding="utf-8") as f:
+            if path.endswith(".prom"):
+                f.write(self.to_prometheus())
+            else:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+def _label(value):
+    escaped = value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+    return f"\"{escaped}\""
@@ -0,0 +1,90 @@
+import time
+import urllib.parse
+import webbrowser
+from http.server import HTTPServer, BaseHTTPRequestHandler
+
+
+class OAuthHandler(BaseHTTPRequestHandler):
+    """Receives the redirect from Spotify's authorization page and keeps its code"""
+
+    def do_GET(self):
+        query = urllib.parse.urlparse(self.path).query
+        params = urllib.parse.parse_qs(query)
+
+        if "code" in params:
+            self.server.auth_code = params["code"][0]
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html')
+            self.end_headers()
+            self.wfile.write("""
+            <html>
+                <head><title>Authorization Successful</title></head>
+                <body style="font-family: Arial; text-align: center; padding: 50px;">
+                    <h2 style="color: #1DB954;">Authorization Successful!</h2>
+                    <p>You can close this tab and return to the application.</p>
+                    <div style="background: #f0f0f0; padding: 20px; margin: 20px; border-radius: 10px;">
+                        <p>Your Spotify account has been connected successfully!</p>
+                    </div>
+                </body>
+            </html>
+            """.encode('utf-8'))
+        elif "error" in params:
+            self.server.auth_code = None
+            self.send_response(400)
+            self.send_header('Content-type', 'text/html')
+            self.end_headers()
+            error = params.get("error", ["unknown"])[0]
+            self.wfile.write(f"""
+            <html>
+                <head><title>Authorization Error</title></head>
+                <body style="font-family: Arial; text-align: center; padding: 50px;">
+                    <h2 style="color: #e22134;">Authorization Failed</h2>
+                    <p>Error: {error}</p>
+                    <p>Please close this tab and try again.</p>
+                </body>
+            </html>
+            """.encode('utf-8'))
+        else:
+            self.send_response(400)
+            self.send_header('Content-type', 'text/html')
+            self.end_headers()
+            self.wfile.write("""
+            <html>
+                <head><title>Invalid Request</title></head>
+                <body style="font-family: Arial; text-align: center; padding: 50px;">
+                    <h2 style="color: #e22134;">Invalid Request</h2>
+                    <p>No authorization code found.</p>
+                </body>
+            </html>
+            """.encode('utf-8'))
+
+    def log_message(self, format, *args):
+        pass  # Suppress server logs
+
+
+def get_auth_code_automatically(auth_url, port=8888, timeout=300):
+    print("Opening authorization URL in your browser...")
+    print("   If it doesn't open automatically, copy this URL:")
+    print(f"   {auth_url}\n")
+
+    server = HTTPServer(("127.0.0.1", port), OAuthHandler)
+    server.auth_code = None
+    server.timeout = 1
+
+    try:
+        webbrowser.open(auth_url)
+    except Exception as e:
+        print(f"Could not open browser: {e}")
+        print("   Please open the URL manually.")
+
+    print(f"Waiting for authorization (timeout: {timeout // 60} minutes)...")
+
+    start_time = time.time()
+    while time.time() - start_time < timeout:
+        server.handle_request()
+        if hasattr(server, 'auth_code') and server.auth_code is not None:
+            return server.auth_code
+        time.sleep(0.1)
+
+    print("Authorization timeout")
+    return None
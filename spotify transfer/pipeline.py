@@ -0,0 +1,58 @@
+import os
+import queue
+import threading
+
+PIPELINE_DEPTH = int(os.getenv("SPOTIFY_PIPELINE_DEPTH", "4"))  # Source pages buffered ahead of the writer
+
+_DONE = object()
+
+
+def stream_batches(pages, batch_size, transform=None, depth=PIPELINE_DEPTH):
+    """Yield lists of batch_size IDs while a background thread keeps reading pages.
+
+    pages is any iterable of ID lists (e.g. one per API page) and transform,
+    if given, maps each page to the IDs that should be written. At most
+    depth pages wait in the queue, so a slow writer stalls the reader
+    instead of letting memory grow. Errors in the reader are re-raised in
+    the consumer.
+    """
+    buffer = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def read():
+        try:
+            for page in pages:
+                if not put(transform(page) if transform else page):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(e)
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    pending = []
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            pending.extend(item)
+            while len(pending) >= batch_size:
+                yield pending[:batch_size]
+                pending = pending[batch_size:]
+        if pending:
+            yield pending
+    finally:
+        stopped.set()  # Lets the reader exit if the consumer stops early
@@ -0,0 +1,84 @@
+from bisect import bisect_left
+from collections import Counter
+
+
+def longest_increasing_subsequence(values):
+    """Indexes into values forming one longest strictly increasing subsequence"""
+    tails = []  # tails[k] = index of the smallest tail of an increasing run of length k + 1
+    tail_values = []
+    previous = [None] * len(values)
+
+    for i, value in enumerate(values):
+        k = bisect_left(tail_values, value)
+        if k > 0:
+            previous[i] = tails[k - 1]
+        if k == len(tails):
+            tails.append(i)
+            tail_values.append(value)
+        else:
+            tails[k] = i
+            tail_values[k] = value
+
+    result = []
+    i = tails[-1] if tails else None
+    while i is not None:
+        result.append(i)
+        i = previous[i]
+    return result[::-1]
+
+
+def plan_playlist_sync(current_ids, desired_ids):
+    """Work out the edits that turn current_ids into desired_ids.
+
+    Returns a dict with:
+      remove  - track IDs to delete (Spotify removes every occurrence of each)
+      moves   - (range_start, insert_before) reorders, applied in sequence
+      inserts - (position, [track IDs]) additions, applied in sequence
+    Tracks already in the right relative order stay put, so the number of
+    edits tracks the size of the change rather than the playlist.
+    """
+    desired_counts = Counter(desired_ids)
+    current_counts = Counter(current_ids)
+
+    # Duplicated more often than the source wants: drop them all and re-add the right number
+    remove = [track_id for track_id in current_counts if current_counts[track_id] > desired_counts[track_id]]
+    removed = set(remove)
+    remaining = [track_id for track_id in current_ids if track_id not in removed]
+
+    # Map each remaining track to its index in the desired order (n-th copy -> n-th slot)
+    slots = {}
+    for index, track_id in enumerate(desired_ids):
+        slots.setdefault(track_id, []).append(index)
+    seen = Counter()
+    targets = []
+    for track_id in remaining:
+        targets.append(slots[track_id][seen[track_id]])
+        seen[track_id] += 1
+
+    # Everything outside the longest in-order run has to move
+    settled = set(targets[i] for i in longest_increasing_subsequence(targets))
+    order = list(targets)
+    moves = []
+    for target in sorted(t for t in targets if t not in settled):
+        start = order.index(target)
+        after = [i for i, t in enumerate(order) if t in settled and t > target]
+        insert_before = after[0] if after else len(order)
+        moves.append((start, insert_before))
+
+        order.pop(start)
+        order.insert(insert_before - 1 if insert_before > start else insert_before, target)
+        settled.add(target)
+
+    # With the kept tracks in order, missing target t belongs at position t
+    present = set(targets)
+    inserts = []
+    for index, track_id in enumerate(desired_ids):
+        if index in present:
+            continue
+        if inserts and inserts[-1][0] + len(inserts[-1][1]) == index:
+            inserts[-1][1].append(track_id)
+        else:
+            inserts.append((index, [track_id]))
+
+    return {"remove": remove, "moves": moves, "inserts": inserts}
+
@@ -0,0 +1,72 @@
+import os
+import threading
+import time
+
+DEFAULT_RATE = float(os.getenv("SPOTIFY_RATE_LIMIT", "10"))  # Requests per second
+DEFAULT_MAX_RATE = float(os.getenv("SPOTIFY_MAX_RATE_LIMIT", "50"))
+MIN_RATE = 0.5
+
+
+class RateLimiter:
+    """Adaptive token bucket shared by every request made for one account.
+
+    The rate grows additively while requests succeed and is cut in half
+    whenever Spotify answers 429, so it settles just below the point where
+    the API starts throttling.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, max_rate=DEFAULT_MAX_RATE, min_rate=MIN_RATE,
+                 burst=None, increase=0.2, decrease=0.5):
+        self.rate = rate
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        self.burst = burst or max(1.0, rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """Reserve one request slot, sleeping until it is available. Returns seconds waited"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.tokens -= 1
+            wait = max(self.blocked_until - now, -self.tokens / self.rate, 0.0)
+
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def estimated_seconds(self, requests):
+        """Time this limiter would spread `requests` requests over, if none were throttled"""
+        rate, tokens, seconds = self.rate, self.tokens, 0.0
+        for _ in range(requests):
+            if tokens < 1:
+                seconds += (1 - tokens) / rate
+                tokens = 1
+            tokens -= 1
+            rate = min(self.max_rate, rate + self.increase)
+        return seconds
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.increase)
+            self.burst = max(self.burst, self.rate)
+
+    def on_throttle(self, retry_after=None):
+        """Back off after a 429; honors Retry-After when the server sends one"""
+        with self.lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until:  # Concurrent 429s for the same burst only count once
+                self.rate = max(self.min_rate, self.rate * self.decrease)
+            self.tokens = min(self.tokens, 0.0)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.blocked_until = max(self.blocked_until, now + pause)
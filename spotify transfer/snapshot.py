@@ -0,0 +1,230 @@
+import mmap
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+from datetime import datetime
+
+from track_store import ID_WIDTH, TrackList, encode_added_at, decode_added_at
+
+MAGIC = b"SPOTSNAP"
+VERSION = 1
+# magic, version, flags, liked songs, playlists, playlist tracks, strings, owner (string), exported at (epoch)
+HEADER = struct.Struct("<8sHHIIIIIq")
+# id, name and description (strings), public, first track, track count
+PLAYLIST = struct.Struct("<IIIBII")
+LIKED_COLUMNS = ("liked_ids", "liked_added_at", "liked_names", "liked_artists")
+
+
+class SnapshotWriter:
+    """Writes a snapshot file column by column as pages of tracks arrive.
+
+    Layout after the header: liked song IDs (22 bytes each), their
+    added_at (int64 epoch seconds), name and artist (uint32 string
+    indexes), the playlist records, playlist track IDs (22 bytes each,
+    one run per playlist), then the string table as uint32 end offsets
+    followed by the UTF-8 data. Every column is spooled to a temporary
+    file, so memory holds only the string index and the playlist records.
+    Use as a context manager: the file appears at path only once it is
+    complete.
+    """
+
+    def __init__(self, path, owner):
+        self.path = path
+        self.columns = {name: tempfile.TemporaryFile() for name in LIKED_COLUMNS + ("playlist_ids", "strings")}
+        self.strings = {}
+        self.string_offsets = array("I", [0])
+        self.liked_count = 0
+        self.playlist_track_count = 0
+        self.playlists = []
+        self.owner = self.intern(owner)
+
+    def intern(self, text):
+        """Index of text in the string table, adding it the first time"""
+        index = self.strings.get(text)
+        if index is None:
+            data = text.encode("utf-8")
+            self.columns["strings"].write(data)
+            self.string_offsets.append(self.string_offsets[-1] + len(data))
+            index = self.strings[text] = len(self.strings)
+        return index
+
+    def add_liked(self, tracks):
+        """Append a TrackList page of saved tracks"""
+        added_at, names, artists = array("q"), array("I"), array("I")
+        for track in tracks:
+            added_at.append(encode_added_at(track["added_at"]))
+            names.append(self.intern(track["name"]))
+            artists.append(self.intern(track["artist"]))
+        self.columns["liked_ids"].write("".join(tracks.ids()).encode("ascii"))
+        for name, column in (("liked_added_at", added_at), ("liked_names", names), ("liked_artists", artists)):
+            self.columns[name].write(_little_endian(column))
+        self.liked_count += len(tracks)
+
+    def add_playlist(self, playlist, pages):
+        """Append a playlist and its tracks, given as TrackList pages"""
+        first_track = self.playlist_track_count
+        for page in pages:
+            self.columns["playlist_ids"].write("".join(page.ids()).encode("ascii"))
+            self.playlist_track_count += len(page)
+        self.playlists.append(PLAYLIST.pack(
+            self.intern(playlist["id"]), self.intern(playlist["name"]), self.intern(playlist["description"] or ""),
+            bool(playlist["public"]), first_track, self.playlist_track_count - first_track))
+
+    def close(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, self.liked_count, len(self.playlists), self.playlist_track_count,
+                                len(self.strings), self.owner, int(time.time())))
+            for name in LIKED_COLUMNS:
+                self._copy_column(name, f)
+            f.write(b"".join(self.playlists))
+            self._copy_column("playlist_ids", f)
+            f.write(_little_endian(self.string_offsets[1:]))
+            self._copy_column("strings", f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self.discard()
+
+    def _copy_column(self, name, f):
+        column = self.columns[name]
+        column.seek(0)
+        shutil.copyfileobj(column, f)
+
+    def discard(self):
+        for column in self.columns.values():
+            column.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+
+class Snapshot:
+    """Read-only view of a snapshot file through mmap.
+
+    Nothing is decoded up front; IDs, dates and strings are read from the
+    mapped file as pages are asked for. Offers the reading side of
+    AccountLibrary (liked_count, iter_liked_pages, playlists,
+    iter_playlist_pages, playlist_track_ids), so a snapshot can stand in
+    for the source account of a transfer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except (ValueError, struct.error):
+            self.data.close()
+            raise
+
+    def _read_header(self):
+        if len(self.data) < HEADER.size:
+            raise ValueError(f"{self.path} is not a snapshot file")
+        magic, version, _, liked, playlists, playlist_tracks, strings, owner, exported_at = \
+            HEADER.unpack_from(self.data)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a snapshot file")
+        if version != VERSION:
+            raise ValueError(f"unsupported snapshot version {version}")
+
+        self._liked_count, self.playlist_count, self.string_count = liked, playlists, strings
+        self.liked_ids_at = HEADER.size
+        self.added_at_at = self.liked_ids_at + liked * ID_WIDTH
+        self.names_at = self.added_at_at + liked * 8
+        self.artists_at = self.names_at + liked * 4
+        self.playlists_at = self.artists_at + liked * 4
+        self.playlist_ids_at = self.playlists_at + playlists * PLAYLIST.size
+        self.string_offsets_at = self.playlist_ids_at + playlist_tracks * ID_WIDTH
+        self.strings_at = self.string_offsets_at + strings * 4
+        if len(self.data) < self.strings_at or (strings and len(self.data) < self.strings_at + self._offset(strings)):
+            raise ValueError(f"{self.path} is truncated")
+
+        self.owner = self.string(owner)
+        self.exported_at = datetime.fromtimestamp(exported_at).isoformat()
+
+    def _offset(self, index):
+        """End offset of string index - 1 in the string data (0 for index 0)"""
+        if index == 0:
+            return 0
+        return struct.unpack_from("<I", self.data, self.string_offsets_at + (index - 1) * 4)[0]
+
+    def string(self, index):
+        start, end = self._offset(index), self._offset(index + 1)
+        return self.data[self.strings_at + start:self.strings_at + end].decode("utf-8")
+
+    def _ids(self, position, count):
+        data = self.data[position:position + count * ID_WIDTH].decode("ascii")
+        return [data[i:i + ID_WIDTH] for i in range(0, len(data), ID_WIDTH)]
+
+    # ---- Liked songs ----
+    def liked_count(self):
+        return self._liked_count
+
+    def iter_liked_pages(self, size=50):
+        """Saved tracks as TrackList pages of up to size tracks, decoded one page at a time"""
+        for start in range(0, self._liked_count, size):
+            count = min(size, self._liked_count - start)
+            added_at = struct.unpack_from(f"<{count}q", self.data, self.added_at_at + start * 8)
+            names = struct.unpack_from(f"<{count}I", self.data, self.names_at + start * 4)
+            artists = struct.unpack_from(f"<{count}I", self.data, self.artists_at + start * 4)
+            page = TrackList()
+            for i, track_id in enumerate(self._ids(self.liked_ids_at + start * ID_WIDTH, count)):
+                page.append(track_id, self.string(names[i]), self.string(artists[i]), decode_added_at(added_at[i]))
+            yield page
+
+    # ---- Playlists ----
+    def playlists(self):
+        """Playlist records in the shape get_playlists returns, plus where their tracks start"""
+        playlists = []
+        for index in range(self.playlist_count):
+            playlist_id, name, description, public, first_track, track_count = \
+                PLAYLIST.unpack_from(self.data, self.playlists_at + index * PLAYLIST.size)
+            playlists.append({
+                "id": self.string(playlist_id),
+                "name": self.string(name),
+                "track_count": track_count,
+                "public": bool(public),
+                "description": self.string(description),
+                "first_track": first_track
+            })
+        return playlists
+
+    def iter_playlist_pages(self, playlist, size=100):
+        """A playlist's tracks as TrackList pages; snapshots keep only their IDs"""
+        for start in range(0, playlist["track_count"], size):
+            count = min(size, playlist["track_count"] - start)
+            page = TrackList()
+            for track_id in self._ids(self.playlist_ids_at + (playlist["first_track"] + start) * ID_WIDTH, count):
+                page.append(track_id, "", "", None)
+            yield page
+
+    def playlist_track_ids(self, playlist):
+        return self._ids(self.playlist_ids_at + playlist["first_track"] * ID_WIDTH, playlist["track_count"])
+
+    def close(self):
+        self.data.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _little_endian(column):
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
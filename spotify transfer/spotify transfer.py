@@ -1,19 +1,52 @@
-import requests
 import base64
 import json
-import webbrowser
-import urllib.parse
 from urllib.parse import urlencode
-from http.server import HTTPServer, BaseHTTPRequestHandler
-from tqdm import tqdm
+import argparse
+import sys
 import threading
 import time
+import math
 import os
+import weakref
+from collections import deque
+from itertools import chain, islice
+from concurrent.futures import CancelledError, ThreadPoolExecutor, as_completed
 from datetime import datetime
-from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
+# tqdm, python-dotenv, webbrowser and http.server are imported only when needed, to keep startup fast
+
+
+def load_env_file():
+    """Load the nearest .env at or above this script's directory, as load_dotenv() would"""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, ".env")
+        if os.path.isfile(path):
+            from dotenv import load_dotenv
+            load_dotenv(path)
+            return
+        if os.path.dirname(directory) == directory:
+            return
+        directory = os.path.dirname(directory)
+
+
+# Load environment variables; before the imports below, which read their SPOTIFY_* settings at import time
+load_env_file()
+
+from spotify_client import SpotifyClient, ACCOUNTS_BASE
+from rate_limiter import RateLimiter
+from token_manager import TokenManager, TokenRefreshError
+from playlist_sync import plan_playlist_sync
+from library_cache import LibraryCache
+from http_cache import HttpCache
+from availability_cache import AvailabilityCache
+from track_store import TrackList
+from pipeline import stream_batches
+from transfer_journal import TransferJournal
+from dead_letters import DeadLetterQueue, DEAD_LETTER_FILE
+from snapshot import Snapshot, SnapshotWriter
+from transfer_history import TransferHistory, HISTORY_FILE, CONTENT_TYPES
+from metrics import Metrics
 
 # === ACCOUNT CONFIGURATIONS ===
 ACCOUNT_1 = {
@@ -33,7 +66,22 @@ ACCOUNT_2 = {
 }
 
 TOKEN_FILE = "spotify_tokens.json"
-TRANSFER_LOG = "transfer_history.json"
+TRANSFER_LOG = HISTORY_FILE
+PLAYLIST_MAP_FILE = "playlist_map.json"  # Source playlist ID -> {destination user ID: playlist ID}
+playlist_map_lock = threading.Lock()
+tokens_lock = threading.RLock()
+library_cache = None  # LibraryCache, set up by main() unless --no-cache is given
+http_cache = None  # HttpCache for conditional GETs, set up by main() unless --no-http-cache is given
+transfer_journal = None  # TransferJournal for the current run, set up by main()
+session_metrics = Metrics()  # Every API call of this run, for --metrics
+dead_letters = None  # DeadLetterQueue for tracks that could not be saved, set up by main()
+availability_cache = None  # AvailabilityCache of /tracks lookups, set up by main() unless --no-cache is given
+availability_check = True  # Resolve IDs against the destination's market before writing; off with --no-availability-check
+BISECT_STATUSES = (400, 404)  # Batch failures a single bad track ID can cause
+PAGE_WORKERS = int(os.getenv("SPOTIFY_PAGE_WORKERS", "4"))  # Concurrent page requests per listing
+PLAYLIST_WORKERS = int(os.getenv("SPOTIFY_PLAYLIST_WORKERS", "4"))  # Playlists transferred at once
+# Only what add_track_item reads; /me/tracks has no `fields` parameter, so liked songs come in full
+PLAYLIST_TRACK_FIELDS = "total,items(added_at,track(id,name,artists(name)))"
 
 
 def validate_environment():
@@ -61,89 +109,54 @@ def validate_environment():
     return True
 
 
-# ------------------- OAuth Handler -------------------
-class OAuthHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        query = urllib.parse.urlparse(self.path).query
-        params = urllib.parse.parse_qs(query)
-
-        if "code" in params:
-            self.server.auth_code = params["code"][0]
-            self.send_response(200)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write("""
-            <html>
-                <head><title>Authorization Successful</title></head>
-                <body style="font-family: Arial; text-align: center; padding: 50px;">
-                    <h2 style="color: #1DB954;">Authorization Successful!</h2>
-                    <p>You can close this tab and return to the application.</p>
-                    <div style="background: #f0f0f0; padding: 20px; margin: 20px; border-radius: 10px;">
-                        <p>Your Spotify account has been connected successfully!</p>
-                    </div>
-                </body>
-            </html>
-            """.encode('utf-8'))
-        elif "error" in params:
-            self.server.auth_code = None
-            self.send_response(400)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            error = params.get("error", ["unknown"])[0]
-            self.wfile.write(f"""
-            <html>
-                <head><title>Authorization Error</title></head>
-                <body style="font-family: Arial; text-align: center; padding: 50px;">
-                    <h2 style="color: #e22134;">Authorization Failed</h2>
-                    <p>Error: {error}</p>
-                    <p>Please close this tab and try again.</p>
-                </body>
-            </html>
-            """.encode('utf-8'))
-        else:
-            self.send_response(400)
-            self.send_header('Content-type', 'text/html')
-            self.end_headers()
-            self.wfile.write("""
-            <html>
-                <head><title>Invalid Request</title></head>
-                <body style="font-family: Arial; text-align: center; padding: 50px;">
-                    <h2 style="color: #e22134;">Invalid Request</h2>
-                    <p>No authorization code found.</p>
-                </body>
-            </html>
-            """.encode('utf-8'))
-
-    def log_message(self, format, *args):
-        pass  # Suppress server logs
-
-
-def get_auth_code_automatically(auth_url, port=8888, timeout=300):
-    print(f"Opening authorization URL in your browser...")
-    print(f"   If it doesn't open automatically, copy this URL:")
-    print(f"   {auth_url}\n")
-
-    server = HTTPServer(("127.0.0.1", port), OAuthHandler)
-    server.auth_code = None
-    server.timeout = 1
+# ------------------- Progress Output -------------------
+def progress_bar(iterable=None, **kwargs):
+    """A tqdm progress bar, importing tqdm the first time one is shown"""
+    from tqdm import tqdm
+    return tqdm(iterable, **kwargs)
 
-    try:
-        webbrowser.open(auth_url)
-    except Exception as e:
-        print(f"Could not open browser: {e}")
-        print("   Please open the URL manually.")
 
-    print(f"Waiting for authorization (timeout: {timeout // 60} minutes)...")
+def progress_write(message):
+    """Print a line without breaking a progress bar that is on screen"""
+    tqdm = sys.modules.get("tqdm")
+    if tqdm is None:  # No bar can be showing before tqdm is loaded
+        print(message)
+    else:
+        tqdm.tqdm.write(message)
 
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        server.handle_request()
-        if hasattr(server, 'auth_code') and server.auth_code is not None:
-            return server.auth_code
-        time.sleep(0.1)
 
-    print("Authorization timeout")
-    return None
+# ------------------- Worker Pools -------------------
+interrupted = threading.Event()  # Set once Ctrl-C reaches a WorkerPool
+
+
+class WorkerPool(ThreadPoolExecutor):
+    """ThreadPoolExecutor that drops its queued tasks when its block is left early.
+
+    Leaving a plain `with ThreadPoolExecutor()` block on an exception
+    still runs every queued task. Here the tasks not yet started are
+    skipped, and Ctrl-C also skips those queued in pools on worker threads
+    (a merge's two directions, batch jobs), which never see the
+    KeyboardInterrupt themselves. Tasks already running are waited for,
+    so what they did is journaled before the journal is closed.
+    """
+
+    def __init__(self, max_workers=None):
+        super().__init__(max_workers=max_workers)
+        self.stopped = threading.Event()
+
+    def submit(self, fn, *args, **kwargs):
+        def run():
+            if self.stopped.is_set() or interrupted.is_set():
+                raise CancelledError()
+            return fn(*args, **kwargs)
+        return super().submit(run)
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.stopped.set()  # Queued tasks return at once; the shutdown below waits only for running ones
+            if issubclass(exc_type, KeyboardInterrupt):
+                interrupted.set()
+        return super().__exit__(exc_type, exc, tb)
 
 
 # ------------------- Helper Functions -------------------
@@ -158,8 +171,8 @@ def get_auth_url(account_config):
     return "https://accounts.spotify.com/authorize?" + urlencode(params)
 
 
-def get_token(account_config, code):
-    url = "https://accounts.spotify.com/api/token"
+def get_token(account_config, code, client):
+    url = f"{ACCOUNTS_BASE}/api/token"
     headers = {
         "Authorization": "Basic " + base64.b64encode(
             f"{account_config['client_id']}:{account_config['client_secret']}".encode()).decode(),
@@ -171,7 +184,7 @@ def get_token(account_config, code):
         "redirect_uri": account_config["redirect_uri"]
     }
 
-    res = requests.post(url, data=data, headers=headers)
+    res = client.post(url, data=data, headers=headers)
     if res.status_code != 200:
         print(f"Token request failed: {res.status_code}")
         print(f"   Response: {res.text}")
@@ -180,8 +193,9 @@ def get_token(account_config, code):
     return res.json()
 
 
-def refresh_token(account_config, refresh_token_val):
-    url = "https://accounts.spotify.com/api/token"
+def refresh_token(account_config, refresh_token_val, client):
+    """Exchange a refresh token for new token data (access_token, expires_in, ...)"""
+    url = f"{ACCOUNTS_BASE}/api/token"
     headers = {
         "Authorization": "Basic " + base64.b64encode(
             f"{account_config['client_id']}:{account_config['client_secret']}".encode()).decode()
@@ -190,184 +204,617 @@ def refresh_token(account_config, refresh_token_val):
         "grant_type": "refresh_token",
         "refresh_token": refresh_token_val
     }
-    res = requests.post(url, data=data, headers=headers)
+    res = client.post(url, data=data, headers=headers)
     res.raise_for_status()
-    return res.json()["access_token"]
+    return res.json()
+
+
+def save_tokens(tokens, path=TOKEN_FILE):
+    with tokens_lock:
+        with open(path, "w") as f:
+            json.dump(tokens, f, indent=2)
+
 
+def store_token_data(tokens, token_data, refresh_key="refresh_token", access_key="access_token", path=TOKEN_FILE):
+    """Save new token data: a rotated refresh token, and the access token with its expiry.
 
-def save_tokens(tokens):
-    with open(TOKEN_FILE, "w") as f:
-        json.dump(tokens, f, indent=2)
+    Keeping the access token lets the next run start without refreshing
+    while it is still valid.
+    """
+    with tokens_lock:
+        if token_data.get("refresh_token"):  # Spotify may rotate the refresh token
+            tokens[refresh_key] = token_data["refresh_token"]
+        tokens[access_key] = token_data["access_token"]
+        tokens[f"{access_key}_expires_at"] = time.time() + token_data.get("expires_in", 3600)
+        save_tokens(tokens, path)
 
 
-def load_tokens():
+def load_tokens(path=TOKEN_FILE):
     try:
-        with open(TOKEN_FILE, "r") as f:
+        with open(path, "r") as f:
             return json.load(f)
     except FileNotFoundError:
         return {}
 
 
-def save_transfer_log(log_entry):
+def load_playlist_map():
     try:
-        with open(TRANSFER_LOG, "r") as f:
-            history = json.load(f)
+        with open(PLAYLIST_MAP_FILE, "r") as f:
+            return json.load(f)
     except FileNotFoundError:
-        history = []
+        return {}
 
-    log_entry["timestamp"] = datetime.now().isoformat()
-    history.append(log_entry)
 
-    with open(TRANSFER_LOG, "w") as f:
-        json.dump(history, f, indent=2)
+def save_playlist_map(playlist_map):
+    with open(PLAYLIST_MAP_FILE, "w") as f:
+        json.dump(playlist_map, f, indent=2)
+
+
+def save_transfer_log(log_entry):
+    log_entry["timestamp"] = datetime.now().isoformat()
+    history = TransferHistory(TRANSFER_LOG)
+    try:
+        history.import_legacy()
+        history.append(log_entry)
+    finally:
+        history.close()
 
 
 # ------------------- Spotify API Functions -------------------
-def get_user_info(access_token):
-    headers = {"Authorization": f"Bearer {access_token}"}
-    res = requests.get("https://api.spotify.com/v1/me", headers=headers)
+user_info_memo = weakref.WeakKeyDictionary()  # client -> /me profile, which doesn't change during a run
+user_info_lock = threading.Lock()
+
+
+def get_user_info(client):
+    with user_info_lock:
+        if client in user_info_memo:
+            return user_info_memo[client]
+    res = client.get("/me")
     res.raise_for_status()
-    return res.json()
+    with user_info_lock:
+        return user_info_memo.setdefault(client, res.json())
+
 
+def iter_pages(client, path, limit=50, params=None):
+    """Yield the items of every page of a paged endpoint, in order.
 
-def get_liked_tracks(access_token):
-    url = "https://api.spotify.com/v1/me/tracks?limit=50"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    tracks = []
+    The first page gives the total; the remaining pages are then fetched
+    concurrently by offset, at most PAGE_WORKERS ahead of the consumer, so
+    a consumer that stops pulling stops the requests too.
+    """
+    params = dict(params or {}, limit=limit, offset=0)
+    res = client.get(path, params=params)
+    res.raise_for_status()
+    data = res.json()
+    yield data.get("items", [])
+
+    offsets = range(limit, data.get("total", 0), limit)
+    if not offsets:
+        return
 
-    while url:
-        res = requests.get(url, headers=headers)
+    def fetch_page(offset):
+        res = client.get(path, params=dict(params, offset=offset))
         res.raise_for_status()
-        data = res.json()
-        tracks.extend([{
-            "id": item["track"]["id"],
-            "name": item["track"]["name"],
-            "artist": ", ".join([artist["name"] for artist in item["track"]["artists"]]),
-            "added_at": item["added_at"]
-        } for item in data.get("items", []) if item.get("track") and item["track"].get("id")])
-        url = data.get("next")
+        return res.json().get("items", [])
+
+    workers = min(PAGE_WORKERS, len(offsets))
+    offsets = iter(offsets)
+    executor = ThreadPoolExecutor(max_workers=workers)
+    try:
+        pending = deque(executor.submit(fetch_page, offset) for offset in islice(offsets, workers))
+        while pending:
+            page = pending.popleft().result()  # Oldest first keeps pages in offset order
+            for offset in islice(offsets, 1):
+                pending.append(executor.submit(fetch_page, offset))
+            yield page
+    finally:
+        # An abandoned listing may be closed on one of these threads, which can't wait for itself
+        executor.shutdown(wait=False)
+
+
+def get_all_items(client, path, limit=50, params=None):
+    items = []
+    for page in iter_pages(client, path, limit, params):
+        items.extend(page)
+    return items
+
+
+def add_track_item(tracks, item):
+    """Append a library/playlist item to a TrackList; False if it has no playable track"""
+    track = item.get("track")
+    if not (track and track.get("id")):
+        return False
+    tracks.append(track["id"], track["name"], ", ".join([artist["name"] for artist in track["artists"]]),
+                  item["added_at"])
+    return True
 
+
+def pack_track_items(items):
+    tracks = TrackList()
+    for item in items:
+        add_track_item(tracks, item)
     return tracks
 
 
-def get_playlists(access_token):
-    url = "https://api.spotify.com/v1/me/playlists?limit=50"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    playlists = []
-    user_id = get_user_info(access_token)['id']
+def get_all_tracks(client, path, limit=50):
+    """Every track of a paged track listing, packed page by page into a TrackList"""
+    tracks = TrackList()
+    for page in iter_pages(client, path, limit):
+        tracks.extend(pack_track_items(page))
+    return tracks
 
-    while url:
-        res = requests.get(url, headers=headers)
-        res.raise_for_status()
-        data = res.json()
 
-        for playlist in data.get("items", []):
-            if playlist["owner"]["id"] == user_id:  # Only user-owned playlists
-                playlists.append({
-                    "id": playlist["id"],
-                    "name": playlist["name"],
-                    "track_count": playlist["tracks"]["total"],
-                    "public": playlist["public"],
-                    "description": playlist.get("description", "")
-                })
+def get_total(client, path):
+    """Read an endpoint's item count from a single limit=1 request"""
+    res = client.get(path, params={"limit": 1})
+    res.raise_for_status()
+    return res.json().get("total", 0)
 
-        url = data.get("next")
 
-    return playlists
+def fetch_liked_tracks(client):
+    return get_all_tracks(client, "/me/tracks", limit=50)
 
 
-def get_playlist_tracks(access_token, playlist_id):
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks?limit=50"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    tracks = []
+def fetch_new_liked_tracks(client, cached_tracks, high_water):
+    """Fetch only pages newer than the cache; None if the library changed in other ways"""
+    new_tracks = TrackList()
+    offset = 0
 
-    while url:
-        res = requests.get(url, headers=headers)
+    while True:
+        res = client.get("/me/tracks", params={"limit": 50, "offset": offset})
         res.raise_for_status()
         data = res.json()
 
         for item in data.get("items", []):
-            if item.get("track") and item["track"].get("id"):
-                tracks.append({
-                    "id": item["track"]["id"],
-                    "name": item["track"]["name"],
-                    "artist": ", ".join([artist["name"] for artist in item["track"]["artists"]]),
-                    "added_at": item["added_at"]
-                })
+            track = item.get("track")
+            if track and track.get("id") in cached_tracks and item["added_at"] <= high_water:
+                new_tracks.extend(cached_tracks)
+                # Tracks removed since the last sync leave the totals out of step
+                return new_tracks if len(new_tracks) == data.get("total") else None
+            add_track_item(new_tracks, item)
+
+        offset += 50
+        if offset >= data.get("total", 0):
+            return None
+
+
+def get_liked_tracks(client, user_id=None):
+    if library_cache is None:
+        return fetch_liked_tracks(client)
+
+    user_id = user_id or get_user_info(client)["id"]
+    tracks = None
+    cached = library_cache.get_saved_tracks(user_id)
+    if cached:
+        tracks = fetch_new_liked_tracks(client, *cached)
+    if tracks is None:
+        tracks = fetch_liked_tracks(client)
+
+    library_cache.put_saved_tracks(user_id, tracks)
+    return tracks
+
+
+def get_playlists(client, user_id=None):
+    user_id = user_id or get_user_info(client)['id']
+    playlists = []
+
+    for playlist in get_all_items(client, "/me/playlists", limit=50):
+        if playlist["owner"]["id"] == user_id:  # Only user-owned playlists
+            playlists.append({
+                "id": playlist["id"],
+                "name": playlist["name"],
+                "track_count": playlist["tracks"]["total"],
+                "public": playlist["public"],
+                "description": playlist.get("description", ""),
+                "snapshot_id": playlist.get("snapshot_id")
+            })
+
+    return playlists
+
+
+def iter_playlist_pages(client, playlist_id, snapshot_id=None):
+    """A playlist's tracks as a series of TrackList pages.
+
+    Served from the cache when its snapshot_id hasn't changed; otherwise
+    streamed page by page (and cached once complete).
+    """
+    caching = library_cache is not None and snapshot_id
+    if caching:
+        tracks = library_cache.get_playlist_tracks(playlist_id, snapshot_id)
+        if tracks is not None:
+            yield tracks
+            return
+
+    tracks = TrackList()
+    for page in iter_pages(client, f"/playlists/{playlist_id}/tracks", limit=100,
+                           params={"fields": PLAYLIST_TRACK_FIELDS}):
+        packed = pack_track_items(page)
+        if caching:
+            tracks.extend(packed)
+        yield packed
+
+    if caching:
+        library_cache.put_playlist_tracks(playlist_id, snapshot_id, tracks)
 
-        url = data.get("next")
 
+def get_playlist_tracks(client, playlist_id, snapshot_id=None):
+    tracks = TrackList()
+    for page in iter_playlist_pages(client, playlist_id, snapshot_id):
+        tracks.extend(page)
     return tracks
 
 
-def save_liked_tracks(access_token, track_ids):
-    url = "https://api.spotify.com/v1/me/tracks"
-    headers = {"Authorization": f"Bearer {access_token}"}
-    failed_count = 0
+def get_saved_track_ids(client, track_ids):
+    """Return the subset of track_ids already saved, using batched /me/tracks/contains checks"""
+    batches = [track_ids[i:i + 50] for i in range(0, len(track_ids), 50)]
 
-    for i in tqdm(range(0, len(track_ids), 50), desc="Saving liked songs"):
-        batch = track_ids[i:i + 50]
-        res = requests.put(url, headers=headers, json={"ids": batch})
+    def check_batch(batch):
+        res = client.get("/me/tracks/contains", params={"ids": ",".join(batch)})
+        res.raise_for_status()
+        return [track_id for track_id, saved in zip(batch, res.json()) if saved]
+
+    saved = set()
+    with WorkerPool(max_workers=PAGE_WORKERS) as executor:
+        for found in executor.map(check_batch, batches):
+            saved.update(found)
+    return saved
 
-        if res.status_code not in (200, 201):
-            failed_count += len(batch)
-            print(f"\nBatch {i // 50 + 1} failed: {res.status_code}")
 
-        time.sleep(0.1)  # Rate limiting
+def lookup_availability(client, track_ids, market):
+    """{track ID: (playable, replacement ID or None)} from /tracks lookups of 50 IDs in market"""
+    batches = [track_ids[i:i + 50] for i in range(0, len(track_ids), 50)]
 
+    def lookup_batch(batch):
+        res = client.get("/tracks", params={"ids": ",".join(batch), "market": market})
+        res.raise_for_status()
+        results = {}
+        for track_id, track in zip(batch, res.json().get("tracks", [])):
+            if not track or track.get("is_playable") is False:
+                results[track_id] = (False, None)
+            elif track.get("id") and track["id"] != track_id:
+                results[track_id] = (True, track["id"])  # Relinked to the market's version of the track
+            else:
+                results[track_id] = (True, None)
+        return results
+
+    found = {}
+    with WorkerPool(max_workers=PAGE_WORKERS) as executor:
+        for results in executor.map(lookup_batch, batches):
+            found.update(results)
+    return found
+
+
+def resolve_track_ids(client, track_ids):
+    """Track IDs as they can be saved in the client account's market; returns (IDs, number left out).
+
+    Relinked IDs are replaced by the market's version and unplayable ones
+    dropped, so they don't fail inside write batches. Only IDs missing
+    from the availability cache are looked up.
+    """
+    market = get_user_info(client).get("country") if availability_check and track_ids else None
+    if not market:
+        return list(track_ids), 0
+
+    unique_ids = list(dict.fromkeys(track_ids))
+    known = availability_cache.get(market, unique_ids) if availability_cache is not None else {}
+    unknown_ids = [track_id for track_id in unique_ids if track_id not in known]
+    if unknown_ids:
+        found = lookup_availability(client, unknown_ids, market)
+        if availability_cache is not None:
+            availability_cache.put(market, found)
+        known.update(found)
+
+    resolved = []
+    for track_id in track_ids:
+        playable, replacement = known.get(track_id, (True, None))
+        if playable:
+            resolved.append(replacement or track_id)
+    return resolved, len(track_ids) - len(resolved)
+
+
+def get_missing_track_ids(library, track_ids, source_size=None):
+    """Filter track_ids down to those not yet saved in the account's library.
+
+    source_size is the number of IDs that will be checked in total, when
+    track_ids is only one page of them.
+    """
+    # Pick whichever costs fewer requests: listing the whole library or checking each ID
+    if library.liked_count() <= (source_size or len(track_ids)):
+        saved = library.liked_tracks()  # TrackList membership tests use its packed ID set
+    else:
+        saved = get_saved_track_ids(library.client, track_ids)
+    return [track_id for track_id in track_ids if track_id not in saved]
+
+
+def send_bisecting(send, batch):
+    """Send a batch, halving it after failures a bad ID can cause until the bad IDs are isolated.
+
+    send(ids) makes one request and returns its response; halves are sent
+    in order. Returns (saved ID lists, [(failed IDs, response)]).
+    """
+    res = send(batch)
+    if res.status_code in (200, 201):
+        return [batch], []
+    if len(batch) == 1 or res.status_code not in BISECT_STATUSES:
+        return [], [(batch, res)]
+
+    middle = len(batch) // 2
+    first_saved, first_failed = send_bisecting(send, batch[:middle])
+    second_saved, second_failed = send_bisecting(send, batch[middle:])
+    return first_saved + second_saved, first_failed + second_failed
+
+
+def error_reason(res):
+    try:
+        return res.json()["error"]["message"]
+    except (ValueError, KeyError, TypeError):
+        return res.text[:200] or res.reason
+
+
+def dead_letter(failures, **target):
+    """Record permanently failed IDs in the dead-letter queue; returns how many there were"""
+    failed_count = 0
+    for track_ids, res in failures:
+        failed_count += len(track_ids)
+        if dead_letters is not None:
+            dead_letters.add(track_ids, res.status_code, error_reason(res), **target)
     return failed_count
 
 
-def create_playlist(access_token, user_id, name, description="", public=False):
-    url = f"https://api.spotify.com/v1/users/{user_id}/playlists"
-    headers = {"Authorization": f"Bearer {access_token}"}
+def save_liked_batches(client, batches, on_batch=None, desc="Saving liked songs", dest_user_id=None):
+    """Save batches of up to 50 IDs as they arrive; returns (sent, failed) track counts.
+
+    A failed batch is split to find the IDs at fault, which go to the
+    dead-letter queue. on_batch(ids, saved) is called for every part of
+    a batch that was saved or given up on.
+    """
+    sent_count = 0
+    failed_count = 0
+
+    def send(ids):
+        return client.put("/me/tracks", json={"ids": ids})
+
+    for number, batch in enumerate(progress_bar(batches, desc=desc), 1):
+        saved, failures = send_bisecting(send, batch)
+        sent_count += len(batch)
+
+        if failures:
+            failed_now = dead_letter(failures, dest=dest_user_id)
+            failed_count += failed_now
+            progress_write(f"   Batch {number}: {failed_now} of {len(batch)} songs failed "
+                       f"({failures[0][1].status_code}), saved to {DEAD_LETTER_FILE}")
+        if on_batch:
+            for ids in saved:
+                on_batch(ids, True)
+            for ids, _ in failures:
+                on_batch(ids, False)
+
+    return sent_count, failed_count
+
+
+def save_liked_tracks(client, track_ids, on_batch=None, desc="Saving liked songs", dest_user_id=None):
+    batches = [track_ids[i:i + 50] for i in range(0, len(track_ids), 50)]
+    return save_liked_batches(client, batches, on_batch, desc, dest_user_id)[1]
+
+
+def create_playlist(client, user_id, name, description="", public=False):
     data = {
         "name": name,
         "description": description,
         "public": public
     }
 
-    res = requests.post(url, headers=headers, json=data)
+    res = client.post(f"/users/{user_id}/playlists", json=data)
     res.raise_for_status()
     return res.json()["id"]
 
 
-def add_tracks_to_playlist(access_token, playlist_id, track_ids):
-    url = f"https://api.spotify.com/v1/playlists/{playlist_id}/tracks"
-    headers = {"Authorization": f"Bearer {access_token}"}
+def add_playlist_batches(client, playlist_id, batches, position=None, on_batch=None):
+    """Add batches of up to 100 IDs as they arrive; returns (sent, failed) track counts.
+
+    Failed batches are split like in save_liked_batches; IDs that still
+    fail go to the dead-letter queue.
+    """
+    url = f"/playlists/{playlist_id}/tracks"
+    sent_count = 0
+    added_count = 0
+    failed_count = 0
+
+    def send(ids):
+        nonlocal added_count
+        data = {"uris": [f"spotify:track:{track_id}" for track_id in ids]}
+        if position is not None:
+            data["position"] = position + added_count  # Parts that failed left no gap
+        res = client.post(url, json=data)
+        if res.status_code in (200, 201):
+            added_count += len(ids)
+        return res
+
+    for batch in batches:
+        saved, failures = send_bisecting(send, batch)
+        sent_count += len(batch)
+
+        if failures:
+            failed_count += dead_letter(failures, playlist_id=playlist_id)
+        if on_batch:
+            for ids in saved:
+                on_batch(ids, True)
+            for ids, _ in failures:
+                on_batch(ids, False)
+
+    return sent_count, failed_count
+
+
+def add_tracks_to_playlist(client, playlist_id, track_ids, position=None, on_batch=None):
+    batches = [track_ids[i:i + 100] for i in range(0, len(track_ids), 100)]
+    return add_playlist_batches(client, playlist_id, batches, position, on_batch)[1]
+
+
+def remove_tracks_from_playlist(client, playlist_id, track_ids):
+    """Remove every occurrence of each track; returns the number of IDs that failed"""
+    url = f"/playlists/{playlist_id}/tracks"
     failed_count = 0
 
     for i in range(0, len(track_ids), 100):
         batch = track_ids[i:i + 100]
-        track_uris = [f"spotify:track:{track_id}" for track_id in batch]
-
-        res = requests.post(url, headers=headers, json={"uris": track_uris})
+        res = client.delete(url, json={"tracks": [{"uri": f"spotify:track:{track_id}"} for track_id in batch]})
 
         if res.status_code not in (200, 201):
             failed_count += len(batch)
 
-        time.sleep(0.1)
-
     return failed_count
 
 
+def move_playlist_track(client, playlist_id, range_start, insert_before):
+    res = client.put(f"/playlists/{playlist_id}/tracks",
+                     json={"range_start": range_start, "insert_before": insert_before, "range_length": 1})
+    res.raise_for_status()
+
+
+def sync_playlist_tracks(client, playlist_id, desired_ids, snapshot_id=None):
+    """Bring an existing playlist in line with desired_ids using only the needed edits"""
+    current_ids = get_playlist_tracks(client, playlist_id, snapshot_id).ids()
+    plan = plan_playlist_sync(current_ids, desired_ids)
+
+    failed_count = remove_tracks_from_playlist(client, playlist_id, plan["remove"])
+    for range_start, insert_before in plan["moves"]:
+        move_playlist_track(client, playlist_id, range_start, insert_before)
+    failed_inserts = 0
+    for position, track_ids in plan["inserts"]:
+        # Planned positions assume every earlier insert landed
+        failed_inserts += add_tracks_to_playlist(client, playlist_id, track_ids, position - failed_inserts)
+    failed_count += failed_inserts
+
+    changes = len(plan["remove"]) + len(plan["moves"]) + sum(len(ids) for _, ids in plan["inserts"])
+    return failed_count, changes
+
+
+# ------------------- Session Data -------------------
+class AccountLibrary:
+    """One account's library data, fetched at most once per run and shared by every step"""
+
+    def __init__(self, client):
+        self.client = client
+        self.lock = threading.Lock()
+        self.memo = {}
+
+    def _memoized(self, key, fetch):
+        with self.lock:
+            if key in self.memo:
+                return self.memo[key]
+        value = fetch()
+        with self.lock:
+            return self.memo.setdefault(key, value)
+
+    def invalidate(self, *keys):
+        """Forget data this run has changed, e.g. after writing to the account"""
+        with self.lock:
+            for key in keys:
+                self.memo.pop(key, None)
+
+    def user_info(self):
+        return self._memoized("user_info", lambda: get_user_info(self.client))
+
+    def user_id(self):
+        return self.user_info()["id"]
+
+    def liked_tracks(self):
+        return self._memoized("liked_tracks", lambda: get_liked_tracks(self.client, self.user_id()))
+
+    def playlists(self):
+        return self._memoized("playlists", lambda: get_playlists(self.client, self.user_id()))
+
+    def iter_liked_pages(self):
+        """Saved tracks as a series of TrackList pages.
+
+        Streamed page by page unless already in memory or in the cache; a
+        fully streamed listing is memoized (and cached) afterwards. Only the
+        compact TrackList is kept for that, not the raw page items.
+        """
+        with self.lock:
+            memoized = "liked_tracks" in self.memo
+        if memoized or (library_cache is not None and library_cache.has_saved_tracks(self.user_id())):
+            yield self.liked_tracks()
+            return
+
+        tracks = TrackList()
+        for page in iter_pages(self.client, "/me/tracks", limit=50):
+            packed = pack_track_items(page)
+            tracks.extend(packed)
+            yield packed
+
+        with self.lock:
+            self.memo.setdefault("liked_tracks", tracks)
+        if library_cache is not None:
+            library_cache.put_saved_tracks(self.user_id(), tracks)
+
+    def iter_playlist_pages(self, playlist):
+        return iter_playlist_pages(self.client, playlist["id"], playlist.get("snapshot_id"))
+
+    def playlist_track_ids(self, playlist):
+        return get_playlist_tracks(self.client, playlist["id"], playlist.get("snapshot_id")).ids()
+
+    def liked_count(self):
+        if "liked_tracks" in self.memo:
+            return len(self.memo["liked_tracks"])
+        return self._memoized("liked_count", lambda: get_total(self.client, "/me/tracks"))
+
+    def playlist_count(self):
+        """All playlists in the library, including followed ones"""
+        return self._memoized("playlist_count", lambda: get_total(self.client, "/me/playlists"))
+
+
 # ------------------- Transfer Functions -------------------
-def transfer_liked_songs(source_token, dest_token):
+def transfer_liked_songs(source, dest, incremental=True):
     print("Transferring liked songs...")
 
-    # Get liked songs from source
-    liked_tracks = get_liked_tracks(source_token)
-    if not liked_tracks:
+    source_count = source.liked_count()
+    if not source_count:
         print("   No liked songs found")
         return {"success": True, "transferred": 0, "failed": 0}
 
-    print(f"   Found {len(liked_tracks)} liked songs")
-
-    # Save to destination
-    track_ids = [track["id"] for track in liked_tracks]
-    failed_count = save_liked_tracks(dest_token, track_ids)
-
-    success_count = len(track_ids) - failed_count
+    print(f"   Found {source_count} liked songs")
+
+    # Batches committed before an interruption don't need sending again
+    committed = transfer_journal.saved_liked_ids(dest.user_id()) if transfer_journal is not None else set()
+    sample = []
+    skipped = {"destination": 0, "journal": 0, "unavailable": 0}
+
+    def select_missing(page):
+        """Runs on the reader thread: decide which IDs of one source page still need saving"""
+        if len(sample) < 10:
+            sample.extend(page[:10 - len(sample)])
+        # Resolved first, so relinked IDs are compared with what the destination actually holds
+        track_ids, unavailable = resolve_track_ids(dest.client, page.ids())
+        skipped["unavailable"] += unavailable
+        if incremental:
+            missing_ids = get_missing_track_ids(dest, track_ids, source_count)
+            skipped["destination"] += len(track_ids) - len(missing_ids)
+            track_ids = missing_ids
+        if committed:
+            remaining_ids = [track_id for track_id in track_ids if track_id not in committed]
+            skipped["journal"] += len(track_ids) - len(remaining_ids)
+            track_ids = remaining_ids
+        return track_ids
+
+    def on_batch(batch, saved):
+        if saved:
+            transfer_journal.record("liked_batch", dest=dest.user_id(), ids=batch)
+
+    # Source pages flow straight into destination batches while later pages are still being read
+    batches = stream_batches(source.iter_liked_pages(), 50, select_missing)
+    sent_count, failed_count = save_liked_batches(dest.client, batches,
+                                                  on_batch if transfer_journal is not None else None,
+                                                  dest_user_id=dest.user_id())
+    dest.invalidate("liked_tracks", "liked_count")
+
+    if skipped["destination"]:
+        print(f"   {skipped['destination']} songs already in destination, skipped")
+    if skipped["journal"]:
+        print(f"   {skipped['journal']} songs already saved by the interrupted run")
+    if skipped["unavailable"]:
+        print(f"   {skipped['unavailable']} songs unavailable in the destination's market, skipped")
+    success_count = sent_count - failed_count
     print(f"   {success_count} songs transferred successfully")
     if failed_count > 0:
         print(f"   {failed_count} songs failed to transfer")
@@ -376,62 +823,219 @@ def transfer_liked_songs(source_token, dest_token):
         "success": failed_count == 0,
         "transferred": success_count,
         "failed": failed_count,
-        "tracks": liked_tracks[:10]  # Sample for log
+        "skipped": skipped["destination"] + skipped["journal"],
+        "unavailable": skipped["unavailable"],
+        "tracks": sample  # Sample for log
     }
 
 
-def transfer_playlists(source_token, dest_token, dest_user_id, selected_playlists=None):
-    print("Transferring playlists...")
+def playlist_marker(playlist_id):
+    return f"[src:{playlist_id}]"
 
-    # Get playlists from source
-    playlists = get_playlists(source_token)
-    if not playlists:
-        print("   No playlists found")
-        return {"success": True, "transferred": 0, "failed": 0}
 
-    if selected_playlists:
-        playlists = [p for p in playlists if p["id"] in selected_playlists]
+def transferred_description(playlist):
+    """Description for the copy, ending with a marker that identifies the source playlist"""
+    marker = playlist_marker(playlist["id"])
+    description = f"Transferred from {playlist['name']} - {playlist['description']}"
+    return f"{description[:299 - len(marker)]} {marker}"  # Spotify caps descriptions at 300 chars
 
-    print(f"   Found {len(playlists)} playlists to transfer")
 
-    transfer_results = []
+def find_synced_playlist(playlist, dest_user_id, dest_playlists, playlist_map):
+    """Destination playlist created by an earlier transfer of this playlist, if it still exists"""
+    mapped_id = playlist_map.get(playlist["id"], {}).get(dest_user_id)
+    marker = playlist_marker(playlist["id"])
 
-    for playlist in tqdm(playlists, desc="Creating playlists"):
-        try:
-            # Get tracks from source playlist
-            tracks = get_playlist_tracks(source_token, playlist["id"])
-            if not tracks:
-                continue
+    for dest_playlist in dest_playlists:
+        if dest_playlist["id"] == mapped_id:
+            return dest_playlist
+    for dest_playlist in dest_playlists:
+        if marker in (dest_playlist["description"] or ""):
+            return dest_playlist
+    return None
+
+
+def transfer_playlist(source, dest_client, dest_user_id, playlist, dest_playlists=None, playlist_map=None):
+    """Copy one playlist of source (an AccountLibrary or Snapshot); returns its result entry, or None if empty.
+
+    When dest_playlists and playlist_map are given, a playlist copied by an
+    earlier run is updated in place instead of being created again. New
+    copies are filled while the source tracks are still being read.
+    """
+    journal = transfer_journal
+    journal_key = {"source_playlist": playlist["id"], "dest": dest_user_id}
+
+    def on_batch(batch, saved):
+        journal.record("playlist_batch", count=len(batch), **journal_key)
+
+    unavailable = [0]
+
+    def stream_source(skip=0):
+        """Resolved source track IDs in batches of 100, leaving out the first `skip` of them"""
+        remaining_skip = [skip]
+
+        def select(page):
+            resolved_ids, unavailable_now = resolve_track_ids(dest_client, page.ids())
+            unavailable[0] += unavailable_now
+            track_ids = resolved_ids[remaining_skip[0]:]
+            remaining_skip[0] = max(0, remaining_skip[0] - len(resolved_ids))
+            return track_ids
+
+        return stream_batches(source.iter_playlist_pages(playlist), 100, select)
+
+    try:
+        if journal is not None and journal.playlist_finished(playlist["id"], dest_user_id):
+            progress_write(f"   {playlist['name']}: already done by the interrupted run")
+            return {"name": playlist["name"], "action": "resumed", "changes": 0,
+                    "tracks_total": playlist["track_count"], "tracks_failed": 0, "success": True}
+
+        started = journal.created_playlist(playlist["id"], dest_user_id) if journal is not None else None
+        existing = None
+        if playlist_map is not None and not started:
+            existing = find_synced_playlist(playlist, dest_user_id, dest_playlists or [], playlist_map)
+
+        if started:
+            # Created by the interrupted run; continue from the first batch it didn't finish
+            new_playlist_id, added_count = started
+            sent_count, failed_count = add_playlist_batches(dest_client, new_playlist_id,
+                                                            stream_source(skip=added_count), on_batch=on_batch)
+            tracks_total = added_count + sent_count
+            changes = sent_count
+            progress_write(f"   {playlist['name']}: resumed, {sent_count - failed_count} more tracks")
+            action = "resumed"
+        elif existing:
+            # Diffing needs the whole source playlist
+            track_ids, unavailable[0] = resolve_track_ids(dest_client, source.playlist_track_ids(playlist))
+            if not track_ids:
+                return None
+            failed_count, changes = sync_playlist_tracks(dest_client, existing["id"], track_ids,
+                                                         existing.get("snapshot_id"))
+            tracks_total = len(track_ids)
+            progress_write(f"   {playlist['name']}: synced, {changes} changes")
+            action = "synced"
+        else:
+            if not playlist["track_count"]:
+                return None
+
+            # Created only once there is something to add, so playlists of local files or of
+            # tracks unavailable in the destination's market don't leave an empty copy behind
+            batches = stream_source()
+            first_batch = next(batches, None)
+            if first_batch is None:
+                return None
 
             # Create playlist in destination
             new_playlist_id = create_playlist(
-                dest_token,
+                dest_client,
                 dest_user_id,
                 f"{playlist['name']} (Transferred)",
-                f"Transferred from {playlist['name']} - {playlist['description']}",
+                transferred_description(playlist),
                 playlist["public"]
             )
+            if journal is not None:
+                journal.record("playlist_created", dest_playlist=new_playlist_id, **journal_key)
+            if playlist_map is not None:
+                with playlist_map_lock:
+                    playlist_map.setdefault(playlist["id"], {})[dest_user_id] = new_playlist_id
+                    save_playlist_map(playlist_map)
+
+            # Add tracks to new playlist as source pages arrive
+            tracks_total, failed_count = add_playlist_batches(
+                dest_client, new_playlist_id, chain([first_batch], batches),
+                on_batch=on_batch if journal is not None else None)
+            changes = tracks_total
+            progress_write(f"   {playlist['name']}: {tracks_total - failed_count}/{tracks_total} tracks")
+            action = "created"
+
+        if journal is not None:
+            journal.record("playlist_done", **journal_key)
+        if unavailable[0]:
+            progress_write(f"   {playlist['name']}: {unavailable[0]} tracks unavailable in the destination's market")
+        return {
+            "name": playlist["name"],
+            "action": action,
+            "changes": changes,
+            "tracks_total": tracks_total,
+            "tracks_failed": failed_count,
+            "tracks_unavailable": unavailable[0],
+            "success": failed_count == 0
+        }
 
-            # Add tracks to new playlist
-            track_ids = [track["id"] for track in tracks]
-            failed_count = add_tracks_to_playlist(dest_token, new_playlist_id, track_ids)
+    except Exception as e:
+        progress_write(f"   Failed to transfer '{playlist['name']}': {e}")
+        return {
+            "name": playlist["name"],
+            "success": False,
+            "error": str(e)
+        }
 
-            transfer_results.append({
-                "name": playlist["name"],
-                "tracks_total": len(track_ids),
-                "tracks_failed": failed_count,
-                "success": failed_count == 0
-            })
 
-            print(f"   {playlist['name']}: {len(track_ids) - failed_count}/{len(track_ids)} tracks")
+def transferred_copy_ids(playlist_map):
+    """IDs of every playlist copy in the map, read under the lock concurrent transfers write it with"""
+    with playlist_map_lock:
+        return frozenset(copy_id for copies in playlist_map.values() for copy_id in copies.values())
 
-        except Exception as e:
-            print(f"   Failed to transfer '{playlist['name']}': {e}")
-            transfer_results.append({
-                "name": playlist["name"],
-                "success": False,
-                "error": str(e)
-            })
+
+def is_transferred_copy(playlist, copy_ids):
+    """True for playlists this tool created in an earlier transfer"""
+    return "[src:" in (playlist["description"] or "") or playlist["id"] in copy_ids
+
+
+def transfer_playlists(source, dest, selected_playlists=None, sync=True, playlist_map=None, skip_copies=False):
+    """Copy the source's playlists to dest.
+
+    playlist_map is shared by concurrent calls so neither overwrites the
+    other's entries; skip_copies leaves out playlists created by earlier
+    transfers, so they aren't copied back to where they came from.
+    """
+    print("Transferring playlists...")
+
+    # Get playlists from source
+    playlists = source.playlists()
+    if skip_copies:
+        if playlist_map is None:
+            playlist_map = load_playlist_map()
+        copy_ids = transferred_copy_ids(playlist_map)
+        playlists = [p for p in playlists if not is_transferred_copy(p, copy_ids)]
+    if not playlists:
+        print("   No playlists found")
+        return {"success": True, "transferred": 0, "failed": 0}
+
+    if selected_playlists:
+        playlists = [p for p in playlists if p["id"] in selected_playlists]
+
+    print(f"   Found {len(playlists)} playlists to transfer")
+
+    # In sync mode, playlists copied by earlier runs are updated rather than duplicated
+    dest_playlists = None
+    if sync:
+        dest_playlists = dest.playlists()
+        if playlist_map is None:
+            playlist_map = load_playlist_map()
+    else:
+        playlist_map = None  # Without a map every playlist is copied anew
+
+    # Several playlists run at once; both clients' rate limiters are shared by all workers
+    results_by_index = {}
+    tracks_done = 0
+
+    with WorkerPool(max_workers=PLAYLIST_WORKERS) as executor, \
+            progress_bar(total=len(playlists), desc="Transferring playlists") as progress:
+        futures = {
+            executor.submit(transfer_playlist, source, dest.client, dest.user_id(), playlist,
+                            dest_playlists, playlist_map): index
+            for index, playlist in enumerate(playlists)
+        }
+        for future in as_completed(futures):
+            result = future.result()
+            results_by_index[futures[future]] = result
+            if result and "tracks_total" in result:
+                tracks_done += result["tracks_total"] - result["tracks_failed"]
+            progress.set_postfix(tracks=tracks_done)
+            progress.update(1)
+    dest.invalidate("playlists", "playlist_count")
+
+    # Keep results in source playlist order
+    transfer_results = [results_by_index[i] for i in sorted(results_by_index) if results_by_index[i]]
 
     successful = sum(1 for r in transfer_results if r.get("success", False))
     failed = len(transfer_results) - successful
@@ -444,20 +1048,707 @@ def transfer_playlists(source_token, dest_token, dest_user_id, selected_playlist
     }
 
 
-# ------------------- Main Application -------------------
-def authorize_account(account_config, account_key, tokens):
-    if f"{account_key}_refresh_token" in tokens:
+def measured(clients, run):
+    """Run run() while recording the clients' requests; returns (result, metrics dict)"""
+    metrics = Metrics()
+    for client in clients:
+        client.hooks.append(metrics.record)
+    try:
+        result = run()
+    finally:
+        for client in clients:
+            client.hooks.remove(metrics.record)
+
+    metrics = metrics.to_dict()
+    time_spent = metrics["time_seconds"]
+    print(f"   API time: {time_spent['reads']:.1f}s reading, {time_spent['writes']:.1f}s writing, "
+          f"{time_spent['throttle_wait']:.1f}s throttled, {time_spent['token_refresh']:.1f}s refreshing tokens")
+    return result, metrics
+
+
+def run_transfer(source, dest, source_name, dest_name, content_type):
+    """One-way transfer of the chosen content; the result is logged and returned"""
+    print(f"\nTransferring {source_name} → {dest_name}")
+    print("-" * 40)
+
+    transfer_log = {
+        "source": source_name,
+        "destination": dest_name,
+        "content_type": content_type
+    }
+
+    def transfer():
+        # Transfer liked songs
+        if content_type in ['1', '3']:
+            liked_result = transfer_liked_songs(source, dest)
+            transfer_log["liked_songs"] = liked_result
+
+        # Transfer playlists
+        if content_type in ['2', '3']:
+            playlist_result = transfer_playlists(source, dest)
+            transfer_log["playlists"] = playlist_result
+
+    # Requests made for this transfer are measured separately from the rest of the session
+    _, transfer_log["metrics"] = measured([source.client, dest.client], transfer)
+
+    save_transfer_log(transfer_log)
+    return transfer_log
+
+
+def merge_liked_songs(first, second, first_name, second_name):
+    """Give both accounts the union of their liked songs.
+
+    Each library is listed once; the two differences are then saved to
+    their destinations concurrently.
+    """
+    print("Merging liked songs...")
+
+    with WorkerPool(max_workers=2) as executor:
+        first_tracks, second_tracks = executor.map(lambda library: library.liked_tracks(), (first, second))
+    print(f"   {first_name}: {len(first_tracks)} liked songs, {second_name}: {len(second_tracks)} liked songs")
+
+    def push(dest, dest_name, track_ids):
+        skipped = 0
+        track_ids, unavailable = resolve_track_ids(dest.client, track_ids)
+        dest_tracks = dest.liked_tracks()
+        track_ids = [track_id for track_id in track_ids if track_id not in dest_tracks]  # Relinked to a saved ID
+        if transfer_journal is not None:
+            committed = transfer_journal.saved_liked_ids(dest.user_id())
+            remaining_ids = [track_id for track_id in track_ids if track_id not in committed]
+            skipped = len(track_ids) - len(remaining_ids)
+            track_ids = remaining_ids
+
+        def on_batch(batch, saved):
+            if saved:
+                transfer_journal.record("liked_batch", dest=dest.user_id(), ids=batch)
+
+        failed_count = save_liked_tracks(dest.client, track_ids, on_batch if transfer_journal is not None else None,
+                                         desc=f"Saving liked songs to {dest_name}", dest_user_id=dest.user_id())
+        dest.invalidate("liked_tracks", "liked_count")
+        return {
+            "success": failed_count == 0,
+            "transferred": len(track_ids) - failed_count,
+            "failed": failed_count,
+            "skipped": skipped,
+            "unavailable": unavailable
+        }
+
+    with WorkerPool(max_workers=2) as executor:
+        to_second = executor.submit(push, second, second_name, first_tracks.difference(second_tracks))
+        to_first = executor.submit(push, first, first_name, second_tracks.difference(first_tracks))
+        results = {f"{first_name} → {second_name}": to_second.result(),
+                   f"{second_name} → {first_name}": to_first.result()}
+
+    for direction, result in results.items():
+        failed = f", {result['failed']} failed" if result["failed"] else ""
+        unavailable = f", {result['unavailable']} unavailable" if result["unavailable"] else ""
+        print(f"   {direction}: {result['transferred']} songs transferred{failed}{unavailable}")
+    return merged_result(results)
+
+
+def merge_playlists(first, second, first_name, second_name):
+    """Copy each account's own playlists to the other, both directions at once.
+
+    Playlists created by earlier transfers are left out on both sides, so
+    merging again updates the copies instead of copying them back.
+    """
+    print("Merging playlists...")
+
+    # Listed once up front; each direction reads one side as source and the other as destination
+    with WorkerPool(max_workers=2) as executor:
+        list(executor.map(lambda library: library.playlists(), (first, second)))
+
+    playlist_map = load_playlist_map()  # Shared, so neither direction overwrites the other's entries
+    with WorkerPool(max_workers=2) as executor:
+        to_second = executor.submit(transfer_playlists, first, second, playlist_map=playlist_map, skip_copies=True)
+        to_first = executor.submit(transfer_playlists, second, first, playlist_map=playlist_map, skip_copies=True)
+        results = {f"{first_name} → {second_name}": to_second.result(),
+                   f"{second_name} → {first_name}": to_first.result()}
+    return merged_result(results)
+
+
+def merged_result(results):
+    """One log entry section for a merge, from its per-direction results"""
+    return {
+        "success": all(result["success"] for result in results.values()),
+        "transferred": sum(result["transferred"] for result in results.values()),
+        "failed": sum(result["failed"] for result in results.values()),
+        "directions": results
+    }
+
+
+def run_merge(first, second, first_name, second_name, content_type):
+    """Two-way merge of the chosen content, logged as a single entry"""
+    print(f"\nMerging {first_name} ↔ {second_name}")
+    print("-" * 40)
+
+    transfer_log = {
+        "source": first_name,
+        "destination": second_name,
+        "content_type": content_type,
+        "mode": "merge"
+    }
+
+    def merge():
+        if content_type in ['1', '3']:
+            transfer_log["liked_songs"] = merge_liked_songs(first, second, first_name, second_name)
+        if content_type in ['2', '3']:
+            transfer_log["playlists"] = merge_playlists(first, second, first_name, second_name)
+
+    _, transfer_log["metrics"] = measured([first.client, second.client], merge)
+
+    save_transfer_log(transfer_log)
+    return transfer_log
+
+
+# ------------------- Transfer Plans -------------------
+PLAN_VERSION = 1
+
+
+def batch_count(count, size):
+    return math.ceil(count / size)
+
+
+def plan_liked_songs(source, dest):
+    """Liked songs dest is missing, from one listing of each library"""
+    with WorkerPool(max_workers=2) as executor:
+        source_tracks, dest_tracks = executor.map(lambda library: library.liked_tracks(), (source, dest))
+    track_ids, unavailable = resolve_track_ids(dest.client, source_tracks.difference(dest_tracks))
+    track_ids = [track_id for track_id in track_ids if track_id not in dest_tracks]
+    return {"track_ids": track_ids, "unavailable": unavailable}, {"PUT /me/tracks": batch_count(len(track_ids), 50)}
+
+
+def plan_playlist(source, dest, playlist, dest_playlists, playlist_map):
+    """(plan entry, requests by endpoint) for one source playlist; entry is None if nothing needs doing"""
+    track_ids, unavailable = resolve_track_ids(dest.client, source.playlist_track_ids(playlist))
+    if not track_ids:
+        return None, {}
+
+    existing = find_synced_playlist(playlist, dest.user_id(), dest_playlists, playlist_map)
+    if existing is None:
+        entry = {
+            "source_id": playlist["id"],
+            "name": playlist["name"],
+            "action": "create",
+            "dest_name": f"{playlist['name']} (Transferred)",
+            "description": transferred_description(playlist),
+            "public": playlist["public"],
+            "track_ids": track_ids,
+            "unavailable": unavailable
+        }
+        return entry, {"POST /users/{id}/playlists": 1,
+                       "POST /playlists/{id}/tracks": batch_count(len(track_ids), 100)}
+
+    current_ids = get_playlist_tracks(dest.client, existing["id"], existing.get("snapshot_id")).ids()
+    edits = plan_playlist_sync(current_ids, track_ids)
+    if not (edits["remove"] or edits["moves"] or edits["inserts"]):
+        return None, {}
+    entry = {
+        "source_id": playlist["id"],
+        "name": playlist["name"],
+        "action": "sync",
+        "dest_playlist_id": existing["id"],
+        "track_ids": track_ids,
+        "unavailable": unavailable,
+        "changes": len(edits["remove"]) + len(edits["moves"]) + sum(len(ids) for _, ids in edits["inserts"])
+    }
+    return entry, {"DELETE /playlists/{id}/tracks": batch_count(len(edits["remove"]), 100),
+                   "PUT /playlists/{id}/tracks": len(edits["moves"]),
+                   "POST /playlists/{id}/tracks": sum(batch_count(len(ids), 100) for _, ids in edits["inserts"])}
+
+
+def plan_playlists(source, dest, playlist_map, skip_copies=False):
+    playlists = source.playlists()
+    if skip_copies:
+        copy_ids = transferred_copy_ids(playlist_map)
+        playlists = [p for p in playlists if not is_transferred_copy(p, copy_ids)]
+    dest_playlists = dest.playlists()
+
+    entries, requests = [], {}
+    with WorkerPool(max_workers=PLAYLIST_WORKERS) as executor:
+        for entry, playlist_requests in executor.map(
+                lambda playlist: plan_playlist(source, dest, playlist, dest_playlists, playlist_map), playlists):
+            if entry:
+                entries.append(entry)
+            for endpoint, count in playlist_requests.items():
+                requests[endpoint] = requests.get(endpoint, 0) + count
+    return entries, requests
+
+
+def estimate_seconds(requests, latency):
+    """Expected wall time of one direction's writes.
+
+    The rate limit bounds all of them; latency bounds liked-song batches,
+    which go one at a time, and playlist writes, PLAYLIST_WORKERS at once.
+    """
+    liked_writes = requests.get("PUT /me/tracks", 0)
+    playlist_writes = sum(requests.values()) - liked_writes
+    rate_bound = RateLimiter().estimated_seconds(liked_writes + playlist_writes)
+    latency_bound = (liked_writes + playlist_writes / PLAYLIST_WORKERS) * latency
+    return max(rate_bound, latency_bound)
+
+
+def plan_transfer(first, second, first_name, second_name, content_type, mode):
+    """Plan one transfer (mode "one-way") or merge (mode "merge") using read requests only"""
+    playlist_map = load_playlist_map()
+    pairs = [(first, second, first_name, second_name)]
+    if mode == "merge":
+        pairs.append((second, first, second_name, first_name))
+
+    def plan_direction(source, dest, source_name, dest_name):
+        direction = {
+            "source": {"name": source_name, "user_id": source.user_id()},
+            "destination": {"name": dest_name, "user_id": dest.user_id()},
+        }
+        requests = {}
+        if content_type in ['1', '3']:
+            direction["liked_songs"], requests = plan_liked_songs(source, dest)
+        if content_type in ['2', '3']:
+            direction["playlists"], playlist_requests = plan_playlists(source, dest, playlist_map,
+                                                                       skip_copies=mode == "merge")
+            requests.update(playlist_requests)
+        direction["requests"] = {endpoint: count for endpoint, count in requests.items() if count}
+        return direction
+
+    print(f"\nPlanning {first_name} {'↔' if mode == 'merge' else '→'} {second_name}")
+    directions, metrics = measured([first.client, second.client],
+                                   lambda: [plan_direction(*pair) for pair in pairs])
+
+    totals = metrics["totals"]
+    latency = totals["latency_seconds"] / totals["requests"] if totals["requests"] else 0.0
+    for direction in directions:
+        direction["estimated_seconds"] = round(estimate_seconds(direction["requests"], latency), 1)
+
+    return {
+        "mode": mode,
+        "content_type": content_type,
+        "directions": directions,
+        "read_requests": totals["requests"],
+        "measured_latency_seconds": round(latency, 4),
+        "write_requests": sum(sum(d["requests"].values()) for d in directions),
+        # Merge directions run concurrently
+        "estimated_seconds": max(d["estimated_seconds"] for d in directions) if mode == "merge"
+        else sum(d["estimated_seconds"] for d in directions)
+    }
+
+
+def write_plan(path, jobs):
+    plan = {
+        "version": PLAN_VERSION,
+        "created": datetime.now().isoformat(),
+        "jobs": jobs,
+        "write_requests": sum(job["write_requests"] for job in jobs),
+        "estimated_seconds": round(sum(job["estimated_seconds"] for job in jobs), 1)
+    }
+    with open(path, "w") as f:
+        json.dump(plan, f, indent=2)
+
+    print(f"\nPlan saved to: {path}")
+    for job in jobs:
+        for direction in job["directions"]:
+            liked = len(direction.get("liked_songs", {}).get("track_ids", []))
+            playlists = direction.get("playlists", [])
+            creates = sum(1 for p in playlists if p["action"] == "create")
+            print(f"   {direction['source']['name']} → {direction['destination']['name']}: "
+                  f"{liked} songs to save, {creates} playlists to create, {len(playlists) - creates} to sync")
+            for endpoint, count in sorted(direction["requests"].items()):
+                print(f"      {endpoint}: {count} requests")
+    minutes, seconds = divmod(plan["estimated_seconds"], 60)
+    print(f"   {plan['write_requests']} write requests, estimated {int(minutes)}m {seconds:.0f}s")
+    print(f"   Run it with --execute-plan {path}")
+    return plan
+
+
+def load_plan(path):
+    with open(path, "r") as f:
+        plan = json.load(f)
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"unsupported plan version {plan.get('version')!r}")
+    return plan
+
+
+def execute_planned_playlist(dest, entry, playlist_map):
+    try:
+        if entry["action"] == "create":
+            playlist_id = create_playlist(dest.client, dest.user_id(), entry["dest_name"],
+                                          entry["description"], entry["public"])
+            with playlist_map_lock:
+                playlist_map.setdefault(entry["source_id"], {})[dest.user_id()] = playlist_id
+                save_playlist_map(playlist_map)
+            failed_count = add_tracks_to_playlist(dest.client, playlist_id, entry["track_ids"])
+        else:
+            failed_count, _ = sync_playlist_tracks(dest.client, entry["dest_playlist_id"], entry["track_ids"])
+        action = "created" if entry["action"] == "create" else "synced"
+        progress_write(f"   {entry['name']}: {action}, {len(entry['track_ids']) - failed_count} tracks")
+        return {"name": entry["name"], "action": action, "tracks_total": len(entry["track_ids"]),
+                "tracks_failed": failed_count, "success": failed_count == 0}
+    except Exception as e:
+        progress_write(f"   Failed to {entry['action']} '{entry['name']}': {e}")
+        return {"name": entry["name"], "success": False, "error": str(e)}
+
+
+def execute_direction(direction, by_user, playlist_map):
+    dest_name = direction["destination"]["name"]
+    dest = by_user[direction["destination"]["user_id"]]
+    transfer_log = {}
+
+    if "liked_songs" in direction:
+        track_ids = direction["liked_songs"]["track_ids"]
+        failed_count = save_liked_tracks(dest.client, track_ids, desc=f"Saving liked songs to {dest_name}",
+                                         dest_user_id=dest.user_id())
+        dest.invalidate("liked_tracks", "liked_count")
+        transfer_log["liked_songs"] = {"success": failed_count == 0, "transferred": len(track_ids) - failed_count,
+                                       "failed": failed_count}
+
+    if "playlists" in direction:
+        with WorkerPool(max_workers=PLAYLIST_WORKERS) as executor:
+            results = list(executor.map(lambda entry: execute_planned_playlist(dest, entry, playlist_map),
+                                        direction["playlists"]))
+        dest.invalidate("playlists", "playlist_count")
+        successful = sum(1 for result in results if result["success"])
+        transfer_log["playlists"] = {"success": successful == len(results), "transferred": successful,
+                                     "failed": len(results) - successful, "results": results}
+    return transfer_log
+
+
+def execute_plan(plan, libraries):
+    """Carry out a saved plan's writes exactly as planned; returns the logged entries"""
+    by_user = {library.user_id(): library for library in libraries}
+    for job in plan["jobs"]:
+        for direction in job["directions"]:
+            for side in ("source", "destination"):
+                if direction[side]["user_id"] not in by_user:
+                    raise ValueError(f"plan needs {direction[side]['name']} (user {direction[side]['user_id']}), "
+                                     "which is not authorized in this run")
+
+    playlist_map = load_playlist_map()
+    transfer_logs = []
+    for job in plan["jobs"]:
+        directions = job["directions"]
+        first, second = directions[0]["source"]["name"], directions[0]["destination"]["name"]
+        print(f"\nExecuting plan: {first} {'↔' if job['mode'] == 'merge' else '→'} {second}")
+        print("-" * 40)
+
+        def run_directions():
+            # Both directions of a merge run at once, as they would without a plan
+            with WorkerPool(max_workers=len(directions)) as executor:
+                return list(executor.map(lambda direction: execute_direction(direction, by_user, playlist_map),
+                                         directions))
+
+        clients = [by_user[directions[0][side]["user_id"]].client for side in ("source", "destination")]
+        results, metrics = measured(clients, run_directions)
+
+        transfer_log = {"source": first, "destination": second, "content_type": job["content_type"],
+                        "mode": job["mode"], "planned": True}
+        for key in ("liked_songs", "playlists"):
+            if key not in results[0]:
+                continue
+            if job["mode"] == "merge":
+                transfer_log[key] = merged_result({
+                    f"{direction['source']['name']} → {direction['destination']['name']}": result[key]
+                    for direction, result in zip(directions, results)})
+            else:
+                transfer_log[key] = results[0][key]
+        transfer_log["metrics"] = metrics
+        save_transfer_log(transfer_log)
+        transfer_logs.append(transfer_log)
+    return transfer_logs
+
+
+# ------------------- Dead Letters -------------------
+def retry_dead_letters(libraries):
+    """Try the tracks in the dead-letter queue again with the given accounts.
+
+    Liked songs are matched to their account by user ID, playlist tracks
+    by playlist owner (and appended at the end). Tracks that fail again
+    go back into the queue, as do tracks a request error kept from being
+    retried; entries for other accounts are kept as they are.
+    """
+    entries = dead_letters.load()
+    if not entries:
+        print("No failed tracks to retry.")
+        return True
+    print(f"Retrying {len(entries)} failed tracks from {DEAD_LETTER_FILE}...")
+
+    by_user = {library.user_id(): library for library in libraries}
+    by_playlist = {playlist["id"]: library for library in libraries for playlist in library.playlists()}
+
+    groups, kept = {}, []
+    for entry in entries:
+        if entry.get("dest") in by_user:
+            groups.setdefault(("dest", entry["dest"]), []).append(entry)
+        elif entry.get("playlist_id") in by_playlist:
+            groups.setdefault(("playlist_id", entry["playlist_id"]), []).append(entry)
+        else:
+            kept.append(entry)
+
+    retried = failed = 0
+    unfinished = []
+    for (kind, target), group in groups.items():
+        track_ids = list(dict.fromkeys(entry["track_id"] for entry in group))
+        done = set()  # Saved, or given up on and dead-lettered again by the save functions
+
+        def on_batch(ids, saved):
+            done.update(ids)
+
         try:
-            refresh_token(account_config, tokens[f"{account_key}_refresh_token"])
-            print(f"   {account_config['name']} already authorized.")
-            return True
-        except Exception:
-            print(f"   Refresh token for {account_config['name']} failed. Re-authorizing...")
-            del tokens[f"{account_key}_refresh_token"]
+            if kind == "dest":
+                failed += save_liked_tracks(by_user[target].client, track_ids, on_batch, dest_user_id=target)
+                by_user[target].invalidate("liked_tracks", "liked_count")
+            else:
+                failed += add_tracks_to_playlist(by_playlist[target].client, target, track_ids, on_batch=on_batch)
+        except Exception as e:
+            print(f"   Retry for {target} stopped: {e}")
+        retried += len(done)
+        unfinished.extend(entry for entry in group if entry["track_id"] not in done)
+
+    # Only now that every retry has finished is the queue rewritten; it keeps what failed again
+    dead_letters.replace(kept + unfinished + dead_letters.load()[len(entries):])
+
+    print(f"   {retried - failed}/{retried} tracks saved")
+    if failed:
+        print(f"   {failed} tracks still failing, kept in {DEAD_LETTER_FILE}")
+    if unfinished:
+        print(f"   {len(unfinished)} tracks weren't retried because of errors, kept in {DEAD_LETTER_FILE}")
+    if kept:
+        print(f"   {len(kept)} tracks belong to other accounts and were left in the queue")
+    return failed == 0 and not unfinished
+
+
+# ------------------- Snapshots -------------------
+SNAPSHOT_SUFFIX = ".snapshot"
+
+
+def snapshot_path(directory, account_name):
+    return os.path.join(directory, f"{account_name}{SNAPSHOT_SUFFIX}")
+
+
+def export_snapshot(library, path):
+    """Stream an account's saved tracks and own playlists into a snapshot file; returns the counts"""
+    print(f"Exporting {library.user_id()} to {path}...")
+    playlists = library.playlists()
+
+    with SnapshotWriter(path, library.user_id()) as writer:
+        for page in library.iter_liked_pages():
+            writer.add_liked(page)
+        for playlist in progress_bar(playlists, desc="Exporting playlists"):
+            writer.add_playlist(playlist, library.iter_playlist_pages(playlist))
+
+    print(f"   {writer.liked_count} liked songs and {len(playlists)} playlists "
+          f"({writer.playlist_track_count} tracks) exported")
+    return {"liked_songs": writer.liked_count, "playlists": len(playlists),
+            "playlist_tracks": writer.playlist_track_count}
+
+
+def run_import(snapshot, dest, dest_name, content_type, skip_copies=False):
+    """Replay a snapshot into dest with the usual transfer writers, logged like a transfer"""
+    print(f"\nImporting {snapshot.path} ({snapshot.owner}, exported {snapshot.exported_at}) → {dest_name}")
+    print("-" * 40)
+
+    transfer_log = {
+        "source": snapshot.owner,
+        "destination": dest_name,
+        "content_type": content_type,
+        "snapshot": snapshot.path
+    }
+
+    def transfer():
+        if content_type in ['1', '3']:
+            transfer_log["liked_songs"] = transfer_liked_songs(snapshot, dest)
+        if content_type in ['2', '3']:
+            transfer_log["playlists"] = transfer_playlists(snapshot, dest, skip_copies=skip_copies)
+
+    # Only the destination is contacted; the source side is read from the file
+    _, transfer_log["metrics"] = measured([dest.client], transfer)
+
+    save_transfer_log(transfer_log)
+    return transfer_log
+
+
+def run_batch_export(job_file, directory, workers=None):
+    """Export every account in a job file to directory/<name>.snapshot at once; returns the exit code"""
+    try:
+        config = load_job_file(job_file)
+    except (OSError, ValueError) as e:
+        print(f"Invalid job file {job_file}: {e}")
+        return 2
+
+    os.makedirs(directory, exist_ok=True)
+    accounts = config["accounts"]
+
+    def export(name):
+        try:
+            return name, export_snapshot(batch_account(name, accounts[name]), snapshot_path(directory, name))
+        except Exception as e:
+            return name, e
+
+    failed = 0
+    with WorkerPool(max_workers=workers or config.get("workers", 2)) as executor:
+        for name, result in executor.map(export, accounts):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"   Export of {name} failed: {result}")
+    print(f"\n{len(accounts) - failed}/{len(accounts)} accounts exported to {directory}")
+    return 1 if failed else 0
+
+
+# ------------------- Batch Mode -------------------
+BATCH_TOKEN_DIR = "tokens"
+BATCH_DIRECTIONS = ("one-way", "both")
+
+
+def load_job_file(path):
+    """Read and check a batch job file; raises ValueError describing the first problem"""
+    with open(path, "r") as f:
+        config = json.load(f)
+
+    accounts = config.get("accounts")
+    jobs = config.get("jobs")
+    if not isinstance(accounts, dict) or not accounts:
+        raise ValueError("job file needs an 'accounts' object")
+    if not isinstance(jobs, list) or not jobs:
+        raise ValueError("job file needs a non-empty 'jobs' list")
+
+    for name, account in accounts.items():
+        for field in ("client_id", "client_secret"):
+            if not account.get(field):
+                raise ValueError(f"account '{name}' is missing '{field}'")
+
+    for number, job in enumerate(jobs, 1):
+        for field in ("source", "destination"):
+            if job.get(field) not in accounts:
+                raise ValueError(f"job {number}: unknown {field} account {job.get(field)!r}")
+        job.setdefault("direction", "one-way")
+        job.setdefault("content", "both")
+        if job["direction"] not in BATCH_DIRECTIONS:
+            raise ValueError(f"job {number}: direction must be one of {', '.join(BATCH_DIRECTIONS)}")
+        if job["content"] not in CONTENT_TYPES:
+            raise ValueError(f"job {number}: content must be one of {', '.join(sorted(CONTENT_TYPES))}")
+
+    return config
+
+
+def batch_account(name, account):
+    """AccountLibrary for a job-file account, with its own client, token store and rate limiter"""
+    token_file = account.get("token_file", os.path.join(BATCH_TOKEN_DIR, f"{name}.json"))
+    tokens = load_tokens(token_file)
+    if not tokens.get("refresh_token"):
+        raise ValueError(f"no refresh_token for account '{name}' in {token_file}")
+
+    account_config = {"name": name, "client_id": account["client_id"], "client_secret": account["client_secret"]}
+    client = SpotifyClient(http_cache=http_cache, cache_namespace=name)
+    client.hooks.append(session_metrics.record)
+
+    def refresh():
+        token_data = refresh_token(account_config, tokens["refresh_token"], client)
+        store_token_data(tokens, token_data, path=token_file)
+        return token_data
+
+    client.token_manager = TokenManager(refresh)
+    client.token_manager.seed_saved(tokens.get("access_token"), tokens.get("access_token_expires_at"))
+    return AccountLibrary(client)
+
+
+def run_job(number, job, accounts, snapshot_dir=None):
+    """Run one job; with snapshot_dir, sources are read from their exported snapshots"""
+    result = {
+        "job": number,
+        "source": job["source"],
+        "destination": job["destination"],
+        "direction": job["direction"],
+        "content": job["content"]
+    }
+    try:
+        content_type = CONTENT_TYPES[job["content"]]
+        if snapshot_dir:
+            # Each direction replays its source's snapshot; copies made by earlier runs aren't sent back
+            pairs = [(job["source"], job["destination"])]
+            if job["direction"] == "both":
+                pairs.append((job["destination"], job["source"]))
+            result["transfers"] = []
+            for source_name, dest_name in pairs:
+                with Snapshot(snapshot_path(snapshot_dir, source_name)) as snapshot:
+                    dest = batch_account(dest_name, accounts[dest_name])
+                    result["transfers"].append(run_import(snapshot, dest, dest_name, content_type,
+                                                          skip_copies=job["direction"] == "both"))
+        else:
+            # Fresh clients per job, so every account pair gets its own rate limiters
+            source = batch_account(job["source"], accounts[job["source"]])
+            dest = batch_account(job["destination"], accounts[job["destination"]])
+            # Profiles are left to the transfer, so its first request doesn't wait on them
+            for error in bootstrap_accounts([source, dest], profiles=False):
+                if error is not None:
+                    raise error
+
+            run = run_merge if job["direction"] == "both" else run_transfer
+            result["transfers"] = [run(source, dest, job["source"], job["destination"], content_type)]
+
+        result["success"] = all(
+            transfer.get(key, {}).get("success", True)
+            for transfer in result["transfers"] for key in ("liked_songs", "playlists"))
+    except Exception as e:
+        result["success"] = False
+        result["error"] = str(e)
+    return result
+
+
+def run_batch(job_file, results_file, workers=None, snapshot_dir=None):
+    """Run every job in a job file; returns the process exit code.
+
+    0 when every job succeeded, 1 when any job failed, 2 when the job file
+    itself is unusable.
+    """
+    try:
+        config = load_job_file(job_file)
+    except (OSError, ValueError) as e:
+        print(f"Invalid job file {job_file}: {e}")
+        return 2
+
+    jobs = config["jobs"]
+    workers = workers or config.get("workers", 2)
+    print(f"Running {len(jobs)} jobs from {job_file} with {workers} workers")
+
+    with WorkerPool(max_workers=workers) as executor:
+        results = list(executor.map(lambda args: run_job(*args, config["accounts"], snapshot_dir),
+                                    enumerate(jobs, 1)))
+
+    with open(results_file, "w") as f:
+        json.dump({"job_file": job_file, "finished": datetime.now().isoformat(), "results": results}, f, indent=2)
+
+    failed = [r for r in results if not r["success"]]
+    print(f"\n{len(results) - len(failed)}/{len(results)} jobs succeeded. Results saved to: {results_file}")
+    for result in failed:
+        print(f"   Job {result['job']} ({result['source']} → {result['destination']}) failed: "
+              f"{result.get('error', 'some tracks or playlists failed')}")
+    return 1 if failed else 0
+
+
+# ------------------- Main Application -------------------
+def authorize_account(account_config, account_key, tokens, client):
+    """Give the client a token manager for the account, authorizing in the browser if needed.
+
+    A saved refresh token isn't checked here: the account's first request
+    uses it, and bootstrap_authorized authorizes again if it was rejected.
+    """
+    token_key = f"{account_key}_refresh_token"
+    access_key = f"{account_key}_access_token"
+
+    def refresh():
+        token_data = refresh_token(account_config, tokens[token_key], client)
+        store_token_data(tokens, token_data, token_key, access_key)
+        return token_data
+
+    client.token_manager = TokenManager(refresh)
+
+    if token_key in tokens:
+        client.token_manager.seed_saved(tokens.get(access_key), tokens.get(f"{access_key}_expires_at"))
+        print(f"   {account_config['name']} already authorized.")
+        return True
 
     print(f"\nAuthorizing {account_config['name']}...")
     print("   Please log in to the correct account in your browser")
 
+    from oauth_server import get_auth_code_automatically
     auth_url = get_auth_url(account_config)
     code = get_auth_code_automatically(auth_url)
 
@@ -465,9 +1756,9 @@ def authorize_account(account_config, account_key, tokens):
         return False
 
     try:
-        token_data = get_token(account_config, code)
-        tokens[f"{account_key}_refresh_token"] = token_data["refresh_token"]
-        save_tokens(tokens)
+        token_data = get_token(account_config, code, client)
+        store_token_data(tokens, token_data, token_key, access_key)
+        client.token_manager.seed(token_data)
         print(f"   {account_config['name']} authorized successfully!")
         return True
     except Exception as e:
@@ -475,11 +1766,63 @@ def authorize_account(account_config, account_key, tokens):
         return False
 
 
-def display_account_info(access_token, account_name):
+def forget_authorization(tokens, account_key):
+    with tokens_lock:
+        for key in list(tokens):
+            if key.startswith(f"{account_key}_"):
+                del tokens[key]
+        save_tokens(tokens)
+
+
+def prompt_account_switch():
+    print("\n   Please switch to your second account in the browser!")
+    print("   (Log out of the first account if needed)")
+    input("   Press Enter when ready to authorize Account 2...")
+
+
+def bootstrap_accounts(libraries, profiles=True):
+    """Get every account its first access token at once, and its profile unless profiles is False.
+
+    Returns the exception each library raised, or None where it worked.
+    """
+    def bootstrap(library):
+        try:
+            if profiles:
+                library.user_info()  # Its request refreshes the access token first if needed
+            else:
+                library.client.token_manager.get()
+        except Exception as e:
+            return e
+        return None
+
+    with WorkerPool(max_workers=len(libraries)) as executor:
+        return list(executor.map(bootstrap, libraries))
+
+
+def bootstrap_authorized(accounts, tokens):
+    """bootstrap_accounts for (config, key, AccountLibrary) tuples, re-authorizing rejected refresh tokens.
+
+    Returns False if an authorization was abandoned; other errors are left
+    for display_account_info to report.
+    """
+    errors = bootstrap_accounts([library for _, _, library in accounts])
+    for (account_config, account_key, library), error in zip(accounts, errors):
+        if not isinstance(error, TokenRefreshError):
+            continue
+        print(f"   Refresh token for {account_config['name']} failed. Re-authorizing...")
+        forget_authorization(tokens, account_key)
+        if len(accounts) > 1 and account_key == "account2":
+            prompt_account_switch()
+        if not authorize_account(account_config, account_key, tokens, library.client):
+            return False
+    return True
+
+
+def display_account_info(library, account_name):
     try:
-        user_info = get_user_info(access_token)
-        liked_count = len(get_liked_tracks(access_token))
-        playlists_count = len(get_playlists(access_token))
+        user_info = library.user_info()
+        liked_count = library.liked_count()
+        playlists_count = library.playlist_count()
 
         print(f"\n{account_name}")
         print(f"   User: {user_info['display_name']}")
@@ -522,7 +1865,125 @@ def choose_content_type():
         print("Invalid choice. Please enter 1, 2, or 3.")
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Transfer liked songs and playlists between Spotify accounts")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="bypass the local library cache and fetch everything from Spotify")
+    parser.add_argument("--no-http-cache", action="store_true",
+                        help="don't revalidate cached API responses with ETags; always download in full")
+    parser.add_argument("--no-availability-check", action="store_true",
+                        help="don't check tracks against the destination's market before saving them")
+    parser.add_argument("--plan", metavar="PATH",
+                        help="write the transfer plan and its cost estimate to PATH without changing anything")
+    parser.add_argument("--execute-plan", metavar="PATH", help="carry out a plan written by --plan")
+    parser.add_argument("--export", metavar="PATH",
+                        help="save an account's liked songs and playlists to a snapshot file "
+                             "(with --batch: every account, into directory PATH)")
+    parser.add_argument("--import", dest="import_path", metavar="PATH",
+                        help="replay a snapshot file into an account "
+                             "(with --batch: each job's source snapshot from directory PATH)")
+    parser.add_argument("--account", type=int, choices=(1, 2),
+                        help="account for --export (default 1) or --import (default 2)")
+    parser.add_argument("--retry-failed", action="store_true",
+                        help=f"retry the tracks in {DEAD_LETTER_FILE} instead of transferring")
+    parser.add_argument("--resume", action="store_true",
+                        help="continue an interrupted transfer, skipping work recorded in the journal")
+    parser.add_argument("--batch", metavar="JOB_FILE",
+                        help="run the account-pair jobs in JOB_FILE without prompts")
+    parser.add_argument("--results", default="batch_results.json",
+                        help="where --batch writes per-job results (default: batch_results.json)")
+    parser.add_argument("--workers", type=int, help="jobs run at once in --batch mode")
+    parser.add_argument("--metrics", metavar="PATH",
+                        help="write per-endpoint request metrics to PATH (Prometheus text for .prom, else JSON)")
+    return parser.parse_args()
+
+
+def snapshot_command(args, tokens):
+    """--export or --import for one interactively authorized account"""
+    global transfer_journal
+    account = args.account or (1 if args.export else 2)
+    account_config, account_key = (ACCOUNT_1, "account1") if account == 1 else (ACCOUNT_2, "account2")
+    client = SpotifyClient(http_cache=http_cache, cache_namespace=account_key)
+    client.hooks.append(session_metrics.record)
+
+    print("\nAccount Authorization")
+    print("-" * 30)
+    if not authorize_account(account_config, account_key, tokens, client):
+        return
+    library = AccountLibrary(client)
+    if not bootstrap_authorized([(account_config, account_key, library)], tokens):
+        return
+
+    try:
+        if args.export:
+            export_snapshot(library, args.export)
+            return
+
+        try:
+            snapshot = Snapshot(args.import_path)
+        except (OSError, ValueError) as e:
+            print(f"Cannot read snapshot {args.import_path}: {e}")
+            return
+        content_type = choose_content_type()
+        transfer_journal = TransferJournal(resume=args.resume)
+        with snapshot:
+            run_import(snapshot, library, account_config["name"], content_type)
+        transfer_journal.close(completed=True)
+        print(f"\nImport complete. Transfer log saved to: {TRANSFER_LOG}")
+    finally:
+        if args.metrics:
+            session_metrics.export(args.metrics)
+
+
 def main():
+    global library_cache, http_cache, transfer_journal, dead_letters, availability_cache, availability_check
+    args = parse_args()
+    if not args.no_http_cache:
+        http_cache = HttpCache()
+    availability_check = not args.no_availability_check
+    if availability_check and not args.no_cache:
+        availability_cache = AvailabilityCache()
+    dead_letters = DeadLetterQueue()
+
+    if args.batch and (args.retry_failed or args.plan or args.execute_plan):
+        try:
+            config = load_job_file(args.batch)
+            libraries = {name: batch_account(name, account) for name, account in config["accounts"].items()}
+            plan = load_plan(args.execute_plan) if args.execute_plan else None
+        except (OSError, ValueError) as e:
+            print(f"Invalid job file or plan: {e}")
+            return 2
+        if args.retry_failed:
+            return 0 if retry_dead_letters(list(libraries.values())) else 1
+        if args.plan:
+            write_plan(args.plan, [
+                plan_transfer(libraries[job["source"]], libraries[job["destination"]], job["source"],
+                              job["destination"], CONTENT_TYPES[job["content"]],
+                              "merge" if job["direction"] == "both" else "one-way")
+                for job in config["jobs"]])
+            return 0
+        logs = execute_plan(plan, list(libraries.values()))
+        return 0 if all(log.get(key, {}).get("success", True)
+                        for log in logs for key in ("liked_songs", "playlists")) else 1
+
+    if args.batch and args.export:
+        if not args.no_cache:
+            library_cache = LibraryCache()
+        exit_code = run_batch_export(args.batch, args.export, args.workers)
+        if args.metrics:
+            session_metrics.export(args.metrics)
+        return exit_code
+
+    if args.batch:
+        if not args.no_cache:
+            library_cache = LibraryCache()
+        transfer_journal = TransferJournal(resume=args.resume)
+        exit_code = run_batch(args.batch, args.results, args.workers, args.import_path)
+        transfer_journal.close(completed=exit_code == 0)
+        if args.metrics:
+            session_metrics.export(args.metrics)
+        return exit_code
+
     print("Advanced Spotify Transfer Tool")
     print("=" * 40)
     print("Transfer liked songs and playlists between accounts!")
@@ -531,42 +1992,61 @@ def main():
     if not validate_environment():
         return
 
+    if not args.no_cache:
+        library_cache = LibraryCache()
+
     tokens = load_tokens()
 
+    if args.export or args.import_path:
+        return snapshot_command(args, tokens)
+
+    client1 = SpotifyClient(http_cache=http_cache, cache_namespace="account1")
+    client2 = SpotifyClient(http_cache=http_cache, cache_namespace="account2")
+    for client in (client1, client2):
+        client.hooks.append(session_metrics.record)
+
     # Step 1: Authorize accounts
     print("\nStep 1: Account Authorization")
     print("-" * 30)
 
-    if not authorize_account(ACCOUNT_1, "account1", tokens):
+    if not authorize_account(ACCOUNT_1, "account1", tokens, client1):
         return
 
-    print("\n   Please switch to your second account in the browser!")
-    print("   (Log out of the first account if needed)")
-    input("   Press Enter when ready to authorize Account 2...")
+    if "account2_refresh_token" not in tokens:
+        prompt_account_switch()
 
-    if not authorize_account(ACCOUNT_2, "account2", tokens):
+    if not authorize_account(ACCOUNT_2, "account2", tokens, client2):
         return
 
-    # Step 2: Get access tokens and display account info
+    # Step 2: Display account info (access tokens are refreshed on demand from here on)
     print("\nStep 2: Account Information")
     print("-" * 30)
 
-    try:
-        token1 = refresh_token(ACCOUNT_1, tokens["account1_refresh_token"])
-        token2 = refresh_token(ACCOUNT_2, tokens["account2_refresh_token"])
-        print("   Access tokens refreshed successfully!")
-    except Exception as e:
-        print(f"Error refreshing tokens: {e}")
-        print("   Try deleting spotify_tokens.json and running again")
+    account1 = AccountLibrary(client1)
+    account2 = AccountLibrary(client2)
+    # Saved tokens are first used here, by both accounts' profile requests at once
+    if not bootstrap_authorized([(ACCOUNT_1, "account1", account1), (ACCOUNT_2, "account2", account2)], tokens):
         return
-
-    user1 = display_account_info(token1, "Account 1")
-    user2 = display_account_info(token2, "Account 2")
+    user1 = display_account_info(account1, "Account 1")
+    user2 = display_account_info(account2, "Account 2")
 
     if not user1 or not user2:
         print("\nTip: If you see 403 errors, delete 'spotify_tokens.json' and restart")
         return
 
+    if args.retry_failed:
+        retry_dead_letters([account1, account2])
+        return
+
+    if args.execute_plan:
+        try:
+            execute_plan(load_plan(args.execute_plan), [account1, account2])
+        except (OSError, ValueError) as e:
+            print(f"Cannot execute plan {args.execute_plan}: {e}")
+            return
+        print(f"\nPlan executed. Transfer log saved to: {TRANSFER_LOG}")
+        return
+
     # Step 3: Choose transfer direction
     direction = choose_transfer_options()
     if direction == '4':
@@ -583,40 +2063,43 @@ def main():
     transfers = []
 
     if direction == '1':  # Account 1 → Account 2
-        transfers.append((token1, token2, user2['id'], "Account 1", "Account 2"))
+        transfers.append((run_transfer, account1, account2, "Account 1", "Account 2"))
     elif direction == '2':  # Account 2 → Account 1
-        transfers.append((token2, token1, user1['id'], "Account 2", "Account 1"))
-    elif direction == '3':  # Both directions
-        transfers.append((token1, token2, user2['id'], "Account 1", "Account 2"))
-        transfers.append((token2, token1, user1['id'], "Account 2", "Account 1"))
-
-    for source_token, dest_token, dest_user_id, source_name, dest_name in transfers:
-        print(f"\nTransferring {source_name} → {dest_name}")
-        print("-" * 40)
-
-        transfer_log = {
-            "source": source_name,
-            "destination": dest_name,
-            "content_type": content_type
-        }
-
-        # Transfer liked songs
-        if content_type in ['1', '3']:
-            liked_result = transfer_liked_songs(source_token, dest_token)
-            transfer_log["liked_songs"] = liked_result
-
-        # Transfer playlists
-        if content_type in ['2', '3']:
-            playlist_result = transfer_playlists(source_token, dest_token, dest_user_id)
-            transfer_log["playlists"] = playlist_result
+        transfers.append((run_transfer, account2, account1, "Account 2", "Account 1"))
+    elif direction == '3':  # Both directions, merged in a single pass
+        transfers.append((run_merge, account1, account2, "Account 1", "Account 2"))
+
+    if args.plan:
+        write_plan(args.plan, [
+            plan_transfer(source, dest, source_name, dest_name, content_type,
+                          "merge" if run is run_merge else "one-way")
+            for run, source, dest, source_name, dest_name in transfers])
+        return
 
-        save_transfer_log(transfer_log)
+    # Every finished batch is journaled so an interrupted run can pick up where it stopped
+    transfer_journal = TransferJournal(resume=args.resume)
+    try:
+        for run, source, dest, source_name, dest_name in transfers:
+            run(source, dest, source_name, dest_name, content_type)
+    except KeyboardInterrupt:
+        transfer_journal.close()
+        print("\n\nTransfer interrupted. Run again with --resume to continue where it stopped.")
+        return
+    except Exception:
+        transfer_journal.close()
+        print("\n\nTransfer stopped by an error. Run again with --resume to continue where it stopped.")
+        raise
+    finally:
+        if args.metrics:
+            session_metrics.export(args.metrics)
+    transfer_journal.close(completed=True)
 
     print(f"\nTransfer Complete!")
     print("=" * 20)
     print(f"Transfer log saved to: {TRANSFER_LOG}")
+    print("   Query it with: python transfer_history.py --help")
     print("You can run this tool again anytime to transfer more content!")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
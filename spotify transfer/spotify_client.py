@@ -0,0 +1,198 @@
+import os
+import re
+import time
+from collections import namedtuple
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from http_cache import cached_response
+from rate_limiter import RateLimiter
+
+API_BASE = os.getenv("SPOTIFY_API_BASE", "https://api.spotify.com/v1")
+ACCOUNTS_BASE = os.getenv("SPOTIFY_ACCOUNTS_BASE", "https://accounts.spotify.com")
+DEFAULT_POOL_SIZE = int(os.getenv("SPOTIFY_HTTP_POOL_SIZE", "20"))
+DEFAULT_TIMEOUT = 30
+DEFAULT_MAX_RETRIES = 5
+RETRY_STATUSES = (429, 503)
+ID_SEGMENT = re.compile(r"^/(playlists|users|tracks|albums|artists)/[^/]+")
+
+# One finished API call, as passed to client hooks. latency is HTTP time summed over
+# attempts, throttle_wait the time spent in the rate limiter; status is None on errors.
+RequestEvent = namedtuple("RequestEvent", [
+    "method", "endpoint", "status", "latency", "throttle_wait", "retries",
+    "bytes_sent", "bytes_received", "error"
+])
+
+
+class SpotifyClient:
+    """Per-account HTTP client backed by a pooled keep-alive session"""
+
+    def __init__(self, access_token=None, pool_size=DEFAULT_POOL_SIZE, api_base=API_BASE,
+                 timeout=DEFAULT_TIMEOUT, rate_limiter=None, max_retries=DEFAULT_MAX_RETRIES,
+                 token_manager=None, http_cache=None, cache_namespace=""):
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.max_retries = max_retries
+        self.token_manager = token_manager  # When set, supplies (and refreshes) the bearer token
+        self.hooks = []  # Callables receiving a RequestEvent after every request
+        self.http_cache = http_cache  # HttpCache for ETag revalidation of GET responses
+        self.cache_namespace = cache_namespace  # Keeps accounts sharing one HttpCache apart
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({
+            "Accept": "application/json",
+            "Accept-Encoding": "gzip, deflate",
+            "Connection": "keep-alive"
+        })
+        self.set_access_token(access_token)
+
+    def set_access_token(self, access_token):
+        self.access_token = access_token
+        if access_token:
+            self.session.headers["Authorization"] = f"Bearer {access_token}"
+        else:
+            self.session.headers.pop("Authorization", None)
+
+    def url(self, path):
+        if path.startswith("http://") or path.startswith("https://"):
+            return path
+        return f"{self.api_base}/{path.lstrip('/')}"
+
+    def endpoint(self, method, url):
+        """Metric label for a request, e.g. 'POST /playlists/{id}/tracks'"""
+        path = urlparse(url).path
+        base_path = urlparse(self.api_base).path
+        if base_path and path.startswith(base_path + "/"):
+            path = path[len(base_path):]
+        return f"{method} " + ID_SEGMENT.sub(r"/\1/{id}", path)
+
+    def _with_token(self, headers):
+        """(headers, token used) with the managed bearer token, unless the caller set Authorization"""
+        if self.token_manager is None or (headers and "Authorization" in headers):
+            return headers, None
+        token = self.token_manager.get()
+        return dict(headers or {}, Authorization=f"Bearer {token}"), token
+
+    def request(self, method, path, **kwargs):
+        """Send a rate-limited request.
+
+        429/503 responses are retried after backing off. A 401 with a
+        managed token is retried once with a freshly refreshed token.
+        GETs with a cached ETag are sent with If-None-Match, and a 304 is
+        answered from the cache.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        url = self.url(path)
+
+        cache_key = cached = None
+        if method == "GET" and self.http_cache is not None:
+            cache_key = self.cache_key(url, kwargs.get("params"))
+            cached = self.http_cache.get(cache_key)
+            if cached:
+                kwargs["headers"] = dict(kwargs.get("headers") or {}, **{"If-None-Match": cached[0]})
+
+        timing = {"attempts": 0, "latency": 0.0, "throttle_wait": 0.0}
+        res = error = None
+        try:
+            res = self._send(method, url, kwargs, timing)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            if self.hooks:
+                self._emit(method, url, res, error, timing)
+
+        if cached and res.status_code == 304:
+            self.http_cache.touch(cache_key)
+            return cached_response(res, cached[1], cached[2])
+        if cache_key and res.status_code == 200 and "ETag" in res.headers:
+            self.http_cache.put(cache_key, res)
+        return res
+
+    def cache_key(self, url, params):
+        prepared = requests.Request("GET", url, params=params).prepare()
+        return f"{self.cache_namespace} {prepared.url}"
+
+    def _send(self, method, url, kwargs, timing):
+        caller_headers = kwargs.pop("headers", None)
+        retried_unauthorized = False
+        attempt = 0
+
+        while True:
+            headers, token = self._with_token(caller_headers)
+            timing["throttle_wait"] += self.rate_limiter.acquire()
+            timing["attempts"] += 1
+            started = time.perf_counter()
+            try:
+                res = self.session.request(method, url, headers=headers, **kwargs)
+            finally:
+                timing["latency"] += time.perf_counter() - started
+
+            if res.status_code == 401 and token and not retried_unauthorized:
+                self.token_manager.invalidate(token)
+                retried_unauthorized = True
+                continue
+            if res.status_code not in RETRY_STATUSES:
+                self.rate_limiter.on_success()
+                return res
+            if attempt == self.max_retries:
+                return res
+
+            retry_after = parse_retry_after(res.headers.get("Retry-After"))
+            if retry_after is None:
+                retry_after = min(2 ** attempt, 30)
+            self.rate_limiter.on_throttle(retry_after)
+            attempt += 1
+
+    def _emit(self, method, url, res, error, timing):
+        body = res.request.body if res is not None else None
+        event = RequestEvent(
+            method=method,
+            endpoint=self.endpoint(method, url),
+            status=res.status_code if res is not None else None,
+            latency=timing["latency"],
+            throttle_wait=timing["throttle_wait"],
+            retries=max(timing["attempts"] - 1, 0),
+            bytes_sent=len(body.encode("utf-8") if isinstance(body, str) else body or b""),
+            bytes_received=len(res.content) if res is not None else 0,
+            error=type(error).__name__ if error is not None else None
+        )
+        for hook in self.hooks:
+            hook(event)
+
+    def get(self, path, **kwargs):
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path, **kwargs):
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path, **kwargs):
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_retry_after(value):
+    """Retry-After in seconds, or None if missing/unparseable"""
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
@@ -0,0 +1,51 @@
+import threading
+import time
+
+REFRESH_MARGIN = 60  # Seconds before expiry at which the token is refreshed
+
+
+class TokenRefreshError(Exception):
+    """The refresh callable failed, e.g. because the refresh token was revoked"""
+
+
+class TokenManager:
+    """Caches one account's access token and refreshes it shortly before it expires.
+
+    refresh is a callable returning Spotify token data ({"access_token",
+    "expires_in", ...}). Refreshes happen under a lock, so when several
+    threads find the token stale only one of them calls refresh and the
+    rest wait for its result.
+    """
+
+    def __init__(self, refresh, refresh_margin=REFRESH_MARGIN):
+        self.refresh = refresh
+        self.refresh_margin = refresh_margin
+        self.lock = threading.Lock()
+        self.access_token = None
+        self.expires_at = 0.0
+
+    def seed(self, token_data):
+        """Store token data obtained elsewhere, e.g. from the authorization code exchange"""
+        self.access_token = token_data["access_token"]
+        self.expires_at = time.monotonic() + token_data.get("expires_in", 3600)
+
+    def seed_saved(self, access_token, expires_at):
+        """Reuse an access token saved by an earlier run; expires_at is wall-clock epoch seconds"""
+        if access_token and expires_at:
+            self.seed({"access_token": access_token, "expires_in": expires_at - time.time()})
+
+    def get(self):
+        with self.lock:
+            if self.access_token is None or time.monotonic() >= self.expires_at - self.refresh_margin:
+                try:
+                    token_data = self.refresh()
+                except Exception as e:
+                    raise TokenRefreshError(str(e)) from e
+                self.seed(token_data)
+            return self.access_token
+
+    def invalidate(self, access_token):
+        """Drop a token the API rejected; a no-op if another thread already replaced it"""
+        with self.lock:
+            if self.access_token == access_token:
+                self.access_token = None
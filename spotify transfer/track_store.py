@@ -0,0 +1,149 @@
+import struct
+from array import array
+from datetime import datetime, timezone
+
+ID_WIDTH = 22  # Spotify IDs are 22 base62 characters
+ADDED_AT_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def encode_added_at(added_at):
+    if not added_at:
+        return -1
+    return int(datetime.fromisoformat(added_at.replace("Z", "+00:00")).timestamp())
+
+
+def decode_added_at(seconds):
+    if seconds < 0:
+        return None
+    return datetime.fromtimestamp(seconds, timezone.utc).strftime(ADDED_AT_FORMAT)
+
+
+class TrackList:
+    """Compact, append-only list of tracks.
+
+    IDs are packed into one fixed-width byte buffer, added_at into an array
+    of epoch seconds, and name/artist into a single UTF-8 blob with offsets,
+    so a track costs a few dozen bytes instead of a dict and four strings.
+    Indexing and iteration decode tracks lazily into the usual
+    {"id", "name", "artist", "added_at"} dicts; ids() and membership tests
+    work on the packed IDs directly.
+    """
+
+    __slots__ = ("_ids", "_added_at", "_text", "_text_offsets", "_id_set")
+
+    def __init__(self, tracks=()):
+        self._ids = bytearray()
+        self._added_at = array("q")
+        self._text = bytearray()
+        self._text_offsets = array("I", [0])
+        self._id_set = None
+        for track in tracks:
+            self.append(track["id"], track["name"], track["artist"], track["added_at"])
+
+    def append(self, track_id, name, artist, added_at):
+        encoded_id = track_id.encode("ascii")
+        if len(encoded_id) != ID_WIDTH:
+            raise ValueError(f"Not a Spotify track ID: {track_id!r}")
+        self._ids += encoded_id
+        self._added_at.append(encode_added_at(added_at))
+        self._text += f"{name}\x1f{artist}".encode("utf-8")
+        self._text_offsets.append(len(self._text))
+        self._id_set = None
+
+    def __len__(self):
+        return len(self._added_at)
+
+    def track_id(self, index):
+        start = index * ID_WIDTH
+        return self._ids[start:start + ID_WIDTH].decode("ascii")
+
+    def ids(self):
+        """All track IDs, in order"""
+        data = self._ids.decode("ascii")
+        return [data[i:i + ID_WIDTH] for i in range(0, len(data), ID_WIDTH)]
+
+    def _track(self, index):
+        text = self._text[self._text_offsets[index]:self._text_offsets[index + 1]].decode("utf-8")
+        name, artist = text.split("\x1f", 1)
+        return {
+            "id": self.track_id(index),
+            "name": name,
+            "artist": artist,
+            "added_at": decode_added_at(self._added_at[index])
+        }
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._track(i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("track index out of range")
+        return self._track(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._track(index)
+
+    def latest_added_at(self):
+        return decode_added_at(max(self._added_at, default=-1))
+
+    # ---- Set operations on IDs ----
+    def id_set(self):
+        if self._id_set is None:
+            self._id_set = frozenset(self.ids())
+        return self._id_set
+
+    def __contains__(self, track_id):
+        return track_id in self.id_set()
+
+    def difference(self, other):
+        """IDs in this list (in order) that are not in other (a TrackList or iterable of IDs)"""
+        exclude = other.id_set() if isinstance(other, TrackList) else set(other)
+        return [track_id for track_id in self.ids() if track_id not in exclude]
+
+    def intersection(self, other):
+        include = other.id_set() if isinstance(other, TrackList) else set(other)
+        return [track_id for track_id in self.ids() if track_id in include]
+
+    def extend(self, other):
+        """Append every track from another TrackList or from an iterable of track dicts"""
+        if isinstance(other, TrackList):
+            base = len(self._text)
+            self._ids += other._ids
+            self._added_at.extend(other._added_at)
+            self._text += other._text
+            self._text_offsets.extend(base + offset for offset in other._text_offsets[1:])
+            self._id_set = None
+        else:
+            for track in other:
+                self.append(track["id"], track["name"], track["artist"], track["added_at"])
+
+    def __add__(self, other):
+        combined = TrackList()
+        combined.extend(self)
+        combined.extend(other)
+        return combined
+
+    # ---- Serialization ----
+    def to_bytes(self):
+        text_offsets = self._text_offsets.tobytes()
+        added_at = self._added_at.tobytes()
+        header = struct.pack("<IIII", len(self), len(text_offsets), len(added_at), len(self._text))
+        return header + bytes(self._ids) + added_at + text_offsets + bytes(self._text)
+
+    @classmethod
+    def from_bytes(cls, data):
+        tracks = cls()
+        count, offsets_size, added_at_size, text_size = struct.unpack_from("<IIII", data)
+        position = struct.calcsize("<IIII")
+        tracks._ids = bytearray(data[position:position + count * ID_WIDTH])
+        position += count * ID_WIDTH
+        tracks._added_at = array("q")
+        tracks._added_at.frombytes(data[position:position + added_at_size])
+        position += added_at_size
+        tracks._text_offsets = array("I")
+        tracks._text_offsets.frombytes(data[position:position + offsets_size])
+        position += offsets_size
+        tracks._text = bytearray(data[position:position + text_size])
+        return tracks
@@ -0,0 +1,169 @@
+import argparse
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+HISTORY_FILE = "transfer_history.jsonl"
+LEGACY_HISTORY_FILE = "transfer_history.json"
+DEFAULT_MAX_BYTES = int(os.getenv("SPOTIFY_HISTORY_MAX_BYTES", str(10 * 1024 * 1024)))
+CONTENT_TYPES = {"liked": "1", "playlists": "2", "both": "3"}
+
+
+class TransferHistory:
+    """Append-only JSON Lines transfer history with a SQLite index for queries.
+
+    Each entry is written with a single O_APPEND write while holding the
+    index's write lock, so concurrent processes never interleave or lose
+    entries. Files are rotated once they pass max_bytes; the index keeps
+    pointing at entries in rotated files.
+    """
+
+    def __init__(self, path=HISTORY_FILE, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.db = sqlite3.connect(os.path.splitext(path)[0] + ".idx.db", timeout=30, isolation_level=None)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                file TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                timestamp TEXT NOT NULL,
+                source TEXT,
+                destination TEXT,
+                content_type TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_timestamp ON entries (timestamp);
+            CREATE INDEX IF NOT EXISTS entries_source ON entries (source, timestamp);
+            CREATE INDEX IF NOT EXISTS entries_destination ON entries (destination, timestamp);
+            CREATE INDEX IF NOT EXISTS entries_content_type ON entries (content_type, timestamp);
+        """)
+
+    def append(self, entry):
+        self.db.execute("BEGIN IMMEDIATE")  # Serializes writers across processes
+        try:
+            self._write(entry)
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return entry
+
+    def _write(self, entry):
+        """Append and index one entry; the caller holds the write lock"""
+        entry.setdefault("timestamp", datetime.now().isoformat())
+        line = (json.dumps(entry) + "\n").encode("utf-8")
+
+        self._rotate_if_needed()
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            offset = os.lseek(fd, 0, os.SEEK_END)
+            os.write(fd, line)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        self.db.execute(
+            "INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (self.path, offset, len(line), entry["timestamp"], entry.get("source"),
+             entry.get("destination"), entry.get("content_type")))
+
+    def _rotate_if_needed(self):
+        try:
+            size = os.path.getsize(self.path)
+        except FileNotFoundError:
+            return
+        if size < self.max_bytes:
+            return
+
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{datetime.now().strftime('%Y%m%d%H%M%S%f')}{ext}"
+        os.replace(self.path, rotated)
+        self.db.execute("UPDATE entries SET file = ? WHERE file = ?", (rotated, self.path))
+
+    def query(self, account=None, since=None, until=None, content_type=None, limit=None):
+        """Matching entries, newest first; only the indexed lines are read from disk"""
+        clauses, params = [], []
+        if account:
+            clauses.append("(source = ? OR destination = ?)")
+            params += [account, account]
+        if since:
+            clauses.append("timestamp >= ?")
+            params.append(since)
+        if until:
+            clauses.append("timestamp < ?")
+            params.append(until)
+        if content_type:
+            clauses.append("content_type = ?")
+            params.append(content_type)
+
+        sql = "SELECT file, offset, length FROM entries"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY timestamp DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+
+        entries = []
+        handles = {}
+        try:
+            for file, offset, length in self.db.execute(sql, params):
+                if file not in handles:
+                    handles[file] = open(file, "rb")
+                handles[file].seek(offset)
+                entries.append(json.loads(handles[file].read(length)))
+        finally:
+            for handle in handles.values():
+                handle.close()
+        return entries
+
+    def import_legacy(self, legacy_path=LEGACY_HISTORY_FILE):
+        """Move entries from the old single-array JSON log into the history, once"""
+        if not os.path.exists(legacy_path):
+            return 0
+
+        # Read, append and rename under one write lock, so concurrent writers import it only once
+        self.db.execute("BEGIN IMMEDIATE")
+        try:
+            try:
+                with open(legacy_path, "r") as f:
+                    legacy_entries = json.load(f)
+            except FileNotFoundError:
+                legacy_entries = []  # Another writer imported it while we waited for the lock
+            else:
+                for entry in legacy_entries:
+                    self._write(entry)
+                os.replace(legacy_path, legacy_path + ".imported")
+            self.db.execute("COMMIT")
+        except BaseException:
+            self.db.execute("ROLLBACK")
+            raise
+        return len(legacy_entries)
+
+    def close(self):
+        self.db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the transfer history")
+    parser.add_argument("--account", help='account name, e.g. "Account 1" (source or destination)')
+    parser.add_argument("--since", help="earliest timestamp, e.g. 2024-01-31")
+    parser.add_argument("--until", help="timestamp to stop before")
+    parser.add_argument("--type", choices=sorted(CONTENT_TYPES), help="content type transferred")
+    parser.add_argument("--limit", type=int, default=20, help="maximum entries to show (default: 20)")
+    parser.add_argument("--file", default=HISTORY_FILE, help=f"history file (default: {HISTORY_FILE})")
+    args = parser.parse_args()
+
+    history = TransferHistory(args.file)
+    try:
+        history.import_legacy()
+        entries = history.query(args.account, args.since, args.until,
+                                CONTENT_TYPES.get(args.type), args.limit)
+    finally:
+        history.close()
+
+    for entry in entries:
+        print(json.dumps(entry))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+import json
+import os
+import threading
+
+JOURNAL_FILE = "transfer_journal.jsonl"
+
+
+class TransferJournal:
+    """Append-only, fsync'd record of finished transfer work.
+
+    Each line is one committed unit: a saved batch of liked songs, a
+    created playlist, a batch of tracks added to it, or a finished
+    playlist. With resume=True the existing journal is replayed so the
+    transfer can skip everything it already records.
+    """
+
+    def __init__(self, path=JOURNAL_FILE, resume=False):
+        self.path = path
+        self.lock = threading.Lock()
+        self.liked_ids = {}          # dest user ID -> set of saved track IDs
+        self.playlists = {}          # (source playlist ID, dest user ID) -> [dest playlist ID, tracks added]
+        self.finished_playlists = set()
+
+        if resume:
+            self._replay()
+        self.file = open(path, "a" if resume else "w", encoding="utf-8")
+
+    def _replay(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        break  # Torn final line from a crash mid-write
+                    self._apply(entry)
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, entry):
+        kind = entry["type"]
+        if kind == "liked_batch":
+            self.liked_ids.setdefault(entry["dest"], set()).update(entry["ids"])
+        elif kind == "playlist_created":
+            self.playlists[(entry["source_playlist"], entry["dest"])] = [entry["dest_playlist"], 0]
+        elif kind == "playlist_batch":
+            self.playlists[(entry["source_playlist"], entry["dest"])][1] += entry["count"]
+        elif kind == "playlist_done":
+            self.finished_playlists.add((entry["source_playlist"], entry["dest"]))
+
+    def record(self, kind, **fields):
+        entry = dict(fields, type=kind)
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            self.file.write(line)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._apply(entry)
+
+    def saved_liked_ids(self, dest_user_id):
+        with self.lock:
+            return set(self.liked_ids.get(dest_user_id, ()))
+
+    def created_playlist(self, source_playlist_id, dest_user_id):
+        """(dest playlist ID, tracks already added) for a playlist started earlier, or None"""
+        with self.lock:
+            created = self.playlists.get((source_playlist_id, dest_user_id))
+            return tuple(created) if created else None
+
+    def playlist_finished(self, source_playlist_id, dest_user_id):
+        with self.lock:
+            return (source_playlist_id, dest_user_id) in self.finished_playlists
+
+    def close(self, completed=False):
+        """Close the journal; a completed transfer has nothing left to resume, so it is removed"""
+        self.file.close()
+        if completed:
+            os.remove(self.path)